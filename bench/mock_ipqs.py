@@ -0,0 +1,258 @@
+"""Local stand-in for the IPQS bulk CSV API.
+
+Serves the endpoints the app uses:
+
+    POST /api/json/csv/upload
+    GET  /api/json/csv/{key}/status/{id}
+    GET  /api/json/csv/{key}/list
+    GET  /download/{id}.csv
+    GET  /api/json/email/{key}/{email}
+
+Jobs move NEW -> PROCESSING -> FINALIZING -> FINISHED on a clock driven
+by queue_delay and per-email processing time. Result rows are derived
+from a hash of each email, so the same list always gets the same
+verdicts, and the single email endpoint returns the same verdicts as the
+CSV download. Every request is counted per endpoint.
+
+Tests can make the next requests to an endpoint fail with an HTTP error
+(fail_next) and script the statuses a job reports (script_statuses).
+
+Run standalone with:
+
+    python bench/mock_ipqs.py --port 8765
+    IPQS_BASE_URL=http://127.0.0.1:8765/api/json/ IPQS_API_KEY=test python -m ipqs ...
+"""
+import argparse
+import io
+import json
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+import numpy as np
+import pandas as pd
+
+
+SPAM_TRAP_LEVELS = np.array(["none", "none", "none", "none", "none", "none", "none", "low", "medium", "high"])
+
+
+def result_frame(emails: list) -> pd.DataFrame:
+    """IPQS-shaped result rows with verdicts derived from each email's hash."""
+    emails = pd.Series(emails, dtype=object).astype(str)
+    bits = pd.util.hash_pandas_object(emails, index=False).to_numpy()
+    return pd.DataFrame({
+        "Date": time.strftime('%Y-%m-%d %H:%M:%S'),
+        "Email Address": emails.to_numpy(),
+        "Valid": (bits % 10) != 0,
+        "Disposable": (bits >> 8) % 25 == 0,
+        "Recent Abuse": (bits >> 16) % 20 == 0,
+        "Honeypot": (bits >> 24) % 100 == 0,
+        "Spam Trap Score": SPAM_TRAP_LEVELS[(bits >> 32) % 10],
+        "Catch All": (bits >> 40) % 8 == 0,
+        "Fraud Score": ((bits >> 48) % 100).astype(int),
+    })
+
+
+class MockIPQS(object):
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                 queue_delay: float = 0.5, seconds_per_1k: float = 0.05, finalize_delay: float = 0.2) -> None:
+        self.latency = latency
+        self.queue_delay = queue_delay
+        self.seconds_per_1k = seconds_per_1k
+        self.finalize_delay = finalize_delay
+        self.requests = Counter()
+        self.jobs = {}
+        self.faults = {}
+        self.scripts = {}
+        self._lock = threading.Lock()
+        self._next_id = 1000
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def base_url(self) -> str:
+        return f"{self.url}/api/json/"
+
+    def start(self) -> "MockIPQS":
+        self._thread = threading.Thread(target=self.server.serve_forever, name="mock-ipqs", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def request_counts(self) -> dict:
+        with self._lock:
+            return dict(self.requests)
+
+    def _count(self, endpoint: str) -> None:
+        with self._lock:
+            self.requests[endpoint] += 1
+
+    def fail_next(self, endpoint: str, status: int, times: int = 1, retry_after=None) -> None:
+        """Answer the next `times` requests to an endpoint with an HTTP error status."""
+        headers = {"Retry-After": str(retry_after)} if retry_after is not None else {}
+        with self._lock:
+            self.faults.setdefault(endpoint, []).extend([(status, headers)] * times)
+
+    def script_statuses(self, csv_id: str, statuses: list) -> None:
+        """Report these statuses for a job, one per status check; the last one repeats."""
+        with self._lock:
+            self.scripts[csv_id] = list(statuses)
+
+    def _fault(self, endpoint: str):
+        with self._lock:
+            faults = self.faults.get(endpoint)
+            return faults.pop(0) if faults else None
+
+    def _status(self, job: dict) -> str:
+        elapsed = time.monotonic() - job["created"]
+        processing = self.seconds_per_1k * len(job["emails"]) / 1000
+        if elapsed < self.queue_delay:
+            return "NEW"
+        if elapsed < self.queue_delay + processing:
+            return "PROCESSING"
+        if elapsed < self.queue_delay + processing + self.finalize_delay:
+            return "FINALIZING"
+        return "FINISHED"
+
+    def upload(self, body: dict) -> dict:
+        emails = [row[0] if isinstance(row, list) else row for row in body.get("input", [])]
+        with self._lock:
+            self._next_id += 1
+            csv_id = str(self._next_id)
+            self.jobs[csv_id] = {"file_name": body.get("file_name", ""), "emails": emails, "created": time.monotonic()}
+        return {"success": True, "id": csv_id, "request_id": f"mock-{csv_id}", "message": "Success."}
+
+    def status(self, csv_id: str) -> dict:
+        job = self.jobs.get(csv_id)
+        if job is None:
+            return {"success": False, "message": "Unknown CSV.", "status": "ERROR"}
+        with self._lock:
+            script = self.scripts.get(csv_id)
+            status = (script.pop(0) if len(script) > 1 else script[0]) if script else None
+        status = status or self._status(job)
+        response = {"success": True, "message": "Success.", "status": status, "id": csv_id}
+        if status == "FINISHED":
+            response["downloads"] = {"all": f"{self.url}/download/{csv_id}.csv"}
+        return response
+
+    def lookup(self, email: str) -> dict:
+        row = result_frame([email]).iloc[0]
+        response = {"success": True, "message": "Success.", "request_id": f"mock-email-{abs(hash(email))}"}
+        for column, value in row.items():
+            if column not in ("Date", "Email Address"):
+                response[column.lower().replace(" ", "_")] = value.item() if hasattr(value, "item") else value
+        return response
+
+    def listing(self, key: str) -> dict:
+        csvs = [{"file_name": job["file_name"], "status": self._status(job),
+                 "status_url": f"{self.base_url}csv/{key}/status/{csv_id}"} for csv_id, job in list(self.jobs.items())]
+        return {"success": True, "csvs": csvs}
+
+    def download(self, csv_id: str) -> bytes:
+        buffer = io.BytesIO()
+        result_frame(self.jobs[csv_id]["emails"]).to_csv(buffer, index=False)
+        return buffer.getvalue()
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, body: bytes, content_type: str = "application/json", headers: dict = None) -> None:
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _json(self, payload: dict) -> None:
+                self._send(200, json.dumps(payload).encode())
+
+            def _failed(self, endpoint: str) -> bool:
+                # Sends an injected error, if one is pending for the endpoint
+                fault = mock._fault(endpoint)
+                if fault is not None:
+                    status, headers = fault
+                    self._send(status, b'{"success": false, "message": "Injected error."}', headers=headers)
+                return fault is not None
+
+            def do_POST(self):
+                time.sleep(mock.latency)
+                if self.path.endswith("/csv/upload"):
+                    mock._count("upload")
+                    length = int(self.headers.get("Content-Length", 0))
+                    body = self.rfile.read(length) or b"{}"
+                    if self._failed("upload"):
+                        return
+                    self._json(mock.upload(json.loads(body)))
+                else:
+                    self._send(404, b"{}")
+
+            def do_GET(self):
+                time.sleep(mock.latency)
+                match = re.search(r"/csv/[^/]+/status/([^/?]+)$", self.path)
+                if match:
+                    mock._count("status")
+                    if self._failed("status"):
+                        return
+                    return self._json(mock.status(match.group(1)))
+                match = re.search(r"/email/[^/]+/([^/?]+)$", self.path)
+                if match:
+                    mock._count("email")
+                    if self._failed("email"):
+                        return
+                    return self._json(mock.lookup(unquote(match.group(1))))
+                match = re.search(r"/csv/([^/]+)/list$", self.path)
+                if match:
+                    mock._count("list")
+                    if self._failed("list"):
+                        return
+                    return self._json(mock.listing(match.group(1)))
+                match = re.search(r"/download/([^/]+)\.csv$", self.path)
+                if match and match.group(1) in mock.jobs:
+                    mock._count("download")
+                    if self._failed("download"):
+                        return
+                    return self._send(200, mock.download(match.group(1)), "text/csv")
+                self._send(404, b"{}")
+
+        return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a local IPQS stand-in server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every request")
+    parser.add_argument("--queue-delay", type=float, default=0.5, help="Seconds a job stays NEW")
+    parser.add_argument("--seconds-per-1k", type=float, default=0.05, help="PROCESSING seconds per 1,000 emails")
+    args = parser.parse_args()
+
+    mock = MockIPQS(args.host, args.port, args.latency, args.queue_delay, args.seconds_per_1k)
+    print(f"Mock IPQS listening on {mock.base_url}")
+    try:
+        mock.server.serve_forever()
+    except KeyboardInterrupt:
+        mock.stop()
+
+
+if __name__ == "__main__":
+    main()
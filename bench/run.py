@@ -0,0 +1,241 @@
+"""End-to-end benchmark of the list-cleansing pipeline against a local IPQS stand-in.
+
+    python bench/run.py                           # 1k, 10k, 100k rows
+    python bench/run.py --sizes 1000000 --duplicate-rate 0.2 --format xlsx
+    python bench/run.py --compare bench/results/20261018_120000.json
+
+Each size gets a synthetic list with a controlled share of duplicate
+emails, then runs ingest -> dedupe -> validate (job submit + wait) ->
+rules -> join -> export with a fresh job store and verdict cache. Wall
+time, peak RSS and mock IPQS request counts are recorded per stage and
+written to bench/results/<timestamp>.json.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.mock_ipqs import MockIPQS
+from ipqs import client
+from ipqs.cache import VerdictCache
+from ipqs.client import Validate
+from ipqs.dedupe import find_duplicates
+from ipqs.export import export_bytes
+from ipqs.ingest import Ingest
+from ipqs.jobs import JobManager, JobStore
+from ipqs.join import join_results
+from ipqs.pipeline import finalize_results, unique_emails
+from ipqs.results import ResultStore
+
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+DEFAULT_SIZES = [1000, 10000, 100000]
+STAGES = ("ingest", "dedupe", "validate", "rules", "join", "export")
+
+# Slowdowns below this share of the baseline, or this many seconds, are treated as noise
+COMPARE_TOLERANCE = 0.10
+COMPARE_MIN_SECONDS = 0.05
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def synthetic_list(rows: int, duplicate_rate: float, seed: int = 0) -> pd.DataFrame:
+    """A contact list where duplicate_rate of the rows repeat an earlier email."""
+    rng = np.random.default_rng(seed)
+    unique = max(1, int(round(rows * (1 - duplicate_rate))))
+    domains = np.array(["gmail.com", "yahoo.com", "outlook.com", "example.com", "company.co"])
+    local_parts = pd.Series(np.arange(unique)).map(lambda n: f"contact{n}")
+    pool = (local_parts + "@" + domains[rng.integers(0, len(domains), unique)]).to_numpy()
+    emails = np.concatenate([pool, pool[rng.integers(0, unique, rows - unique)]])
+    rng.shuffle(emails)
+    return pd.DataFrame({
+        "First Name": [f"First{n}" for n in range(rows)],
+        "Last Name": [f"Last{n}" for n in range(rows)],
+        "Company": rng.choice(["Acme", "Globex", "Initech", "Umbrella"], rows),
+        "Email": emails,
+    })
+
+
+def write_list(df: pd.DataFrame, path: str, fmt: str) -> None:
+    if fmt == 'xlsx':
+        df.to_excel(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+
+
+class StageTimer(object):
+    """Records wall time, peak RSS and mock request counts for each stage."""
+
+    def __init__(self, mock: MockIPQS) -> None:
+        self.mock = mock
+        self.stages = {}
+
+    def run(self, name: str, func, *args, **kwargs):
+        requests_before = self.mock.request_counts()
+        rss_before = peak_rss_mb()
+        started = time.perf_counter()
+        value = func(*args, **kwargs)
+        elapsed = time.perf_counter() - started
+        requests_after = self.mock.request_counts()
+        self.stages[name] = {
+            "seconds": round(elapsed, 4),
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+            "rss_growth_mb": round(peak_rss_mb() - rss_before, 1),
+            "requests": {endpoint: count - requests_before.get(endpoint, 0)
+                         for endpoint, count in requests_after.items()
+                         if count - requests_before.get(endpoint, 0)},
+        }
+        return value
+
+
+def run_size(rows: int, args, mock: MockIPQS, workdir: str) -> dict:
+    source = synthetic_list(rows, args.duplicate_rate, args.seed)
+    path = os.path.join(workdir, f"list_{rows}.{args.format}")
+    write_list(source, path, args.format)
+    del source
+
+    job_manager = JobManager(Validate("bench", base_url=mock.base_url),
+                             store=JobStore(os.path.join(workdir, f"jobs_{rows}")),
+                             verdict_cache=VerdictCache(os.path.join(workdir, f"cache_{rows}.sqlite3")),
+                             result_store=ResultStore(os.path.join(workdir, f"results_{rows}")),
+                             shard_size=args.shard_size, resume=False)
+    timer = StageTimer(mock)
+    started = time.perf_counter()
+
+    def ingest_stage():
+        ingest = Ingest(path)
+        return ingest, ingest.read_emails()
+
+    def validate_stage(emails):
+        job_id = job_manager.submit("BENCH", f"BENCH_list_{rows}", unique_emails(emails))
+        job = job_manager.wait(job_id, interval=args.wait_interval)
+        return job, job_manager.result(job_id)
+
+    ingest, emails = timer.run("ingest", ingest_stage)
+    duplicates = timer.run("dedupe", find_duplicates, emails)
+    job, results = timer.run("validate", validate_stage, emails)
+    if job["status"] != "FINISHED":
+        raise RuntimeError(f"Validation job ended as {job['status']}: {job['message']}")
+    timer.run("rules", finalize_results, results, "BENCH")
+
+    def join_stage():
+        df = ingest.read_rows()
+        return df, join_results(df, ingest.email_column, results)
+
+    df, unmatched = timer.run("join", join_stage)
+    output = timer.run("export", export_bytes, df, args.format)
+    ingest.close()
+
+    return {
+        "rows": rows,
+        "unique_emails": job["total_emails"],
+        "duplicates": duplicates.count,
+        "unmatched": unmatched,
+        "output_bytes": len(output),
+        "total_seconds": round(time.perf_counter() - started, 4),
+        "stages": timer.stages,
+    }
+
+
+def compare(current: dict, baseline: dict) -> list:
+    """Lines describing per-stage time changes against a previous result file."""
+    baseline_runs = {run["rows"]: run for run in baseline["runs"]}
+    lines = []
+    for run in current["runs"]:
+        previous = baseline_runs.get(run["rows"])
+        if previous is None:
+            continue
+        for stage in STAGES:
+            before = previous["stages"].get(stage, {}).get("seconds")
+            after = run["stages"].get(stage, {}).get("seconds")
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            regressed = change > COMPARE_TOLERANCE and after - before > COMPARE_MIN_SECONDS
+            flag = "REGRESSION" if regressed else ""
+            lines.append(f"{run['rows']:>9,} {stage:<9} {before:>9.3f}s -> {after:>9.3f}s {change:+7.1%} {flag}")
+    return lines
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmark the IPQS pipeline against a local mock server.")
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES, help="List sizes in rows")
+    parser.add_argument("--duplicate-rate", type=float, default=0.1, help="Share of rows repeating an earlier email")
+    parser.add_argument("--format", default="csv", choices=["csv", "xlsx"], help="Input and export format")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--shard-size", type=int, default=None, help="Emails per IPQS CSV (default: IPQS_SHARD_SIZE)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Mock seconds added to every request")
+    parser.add_argument("--queue-delay", type=float, default=0.5, help="Mock seconds a job stays NEW")
+    parser.add_argument("--seconds-per-1k", type=float, default=0.05, help="Mock PROCESSING seconds per 1,000 emails")
+    parser.add_argument("--real-polling", action="store_true",
+                        help="Keep the production poll intervals instead of polling every 0.1s")
+    parser.add_argument("--wait-interval", type=float, default=0.1, help="Seconds between job state checks")
+    parser.add_argument("--output", default=None, help="Result file (default: bench/results/<timestamp>.json)")
+    parser.add_argument("--compare", default=None, help="Previous result file to compare against")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.shard_size is None:
+        from ipqs.shards import SHARD_SIZE
+        args.shard_size = SHARD_SIZE
+    if not args.real_polling:
+        # Measure the pipeline rather than the poll back-off
+        client.POLL_INTERVALS = dict.fromkeys(client.POLL_INTERVALS, 0.1)
+        client.POLL_MAX_INTERVAL = 0.1
+
+    mock = MockIPQS(latency=args.latency, queue_delay=args.queue_delay, seconds_per_1k=args.seconds_per_1k).start()
+    runs = []
+    try:
+        with tempfile.TemporaryDirectory(prefix="ipqs-bench-") as workdir:
+            for rows in args.sizes:
+                print(f"Running {rows:,} rows...", file=sys.stderr)
+                run = run_size(rows, args, mock, workdir)
+                runs.append(run)
+                for stage in STAGES:
+                    stats = run["stages"][stage]
+                    print(f"  {stage:<9} {stats['seconds']:>9.3f}s  peak {stats['peak_rss_mb']:>8.1f} MB  {stats['requests']}",
+                          file=sys.stderr)
+    finally:
+        mock.stop()
+
+    result = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "config": vars(args),
+        "runs": runs,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, datetime.now().strftime("%Y%m%d_%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, 'w') as handle:
+        json.dump(result, handle, indent=2)
+    print(f"Saved {output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as handle:
+            lines = compare(result, json.load(handle))
+        print("\n".join(lines))
+        if any(line.endswith("REGRESSION") for line in lines):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
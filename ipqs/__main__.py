@@ -0,0 +1,6 @@
+import sys
+
+from ipqs.cli import main
+
+
+sys.exit(main())
@@ -0,0 +1,185 @@
+"""Buffered audit logging of IPQS jobs.
+
+Entries are queued by the page and written in batches by a background
+thread, so logging never blocks the UI. Batches that cannot be written
+(Sheets slow, rate-limited or down) go to a local spool file and are
+replayed before the next successful write. Spool lines that do not parse
+(cut short when the process died mid-append) are moved to a ".damaged"
+file next to the spool rather than blocking every later replay.
+"""
+import json
+import os
+import queue
+import tempfile
+import threading
+import time
+
+from ipqs.metrics import log_event
+
+
+AUDIT_SHEET_URL = 'https://docs.google.com/spreadsheets/d/11CZgEFDvJP7RzlD736WWiOaky7_VL1r3omX2lihNYAw/edit#gid=0'
+AUDIT_SCOPES = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
+
+DEFAULT_SPOOL_PATH = os.getenv('IPQS_AUDIT_SPOOL', os.path.join('.cache', 'audit_spool.jsonl'))
+
+BATCH_SIZE = 50
+FLUSH_INTERVAL = 2.0
+RETRY_INTERVAL = 30.0
+
+
+class AuditSink(object):
+    """Destination for batches of audit rows."""
+
+    def write(self, rows: list) -> None:
+        raise NotImplementedError
+
+
+class SheetsSink(AuditSink):
+    """Appends rows to the first worksheet of the audit spreadsheet."""
+
+    def __init__(self, google_json: str, spreadsheet_url: str = AUDIT_SHEET_URL) -> None:
+        self.google_json = google_json
+        self.spreadsheet_url = spreadsheet_url
+        self._worksheet = None
+
+    def worksheet(self):
+        # Authorize once and keep the worksheet handle for every later batch
+        if self._worksheet is None:
+            import gspread
+            from google.oauth2 import service_account
+
+            service_account_info = json.loads(self.google_json)
+            credentials = service_account.Credentials.from_service_account_info(service_account_info)
+            client = gspread.authorize(credentials.with_scopes(AUDIT_SCOPES))
+            self._worksheet = client.open_by_url(self.spreadsheet_url).get_worksheet(0)
+        return self._worksheet
+
+    def write(self, rows: list) -> None:
+        try:
+            self.worksheet().append_rows(rows)
+        except Exception:
+            # Re-authorize on the next batch in case the session went stale
+            self._worksheet = None
+            raise
+
+
+class FileSink(AuditSink):
+    """Appends rows as JSON lines to a local file."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def write(self, rows: list) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        data = "".join(json.dumps(row, default=str) + '\n' for row in rows).encode('utf-8')
+        with open(self.path, 'a+b') as handle:
+            # A line cut short by a crash is ended first, so it does not swallow the next row
+            if handle.seek(0, os.SEEK_END):
+                handle.seek(-1, os.SEEK_END)
+                if handle.read(1) != b'\n':
+                    data = b'\n' + data
+            handle.write(data)
+
+
+class MemorySink(AuditSink):
+    """Keeps rows in a list; handy for tests and local runs."""
+
+    def __init__(self) -> None:
+        self.rows = []
+
+    def write(self, rows: list) -> None:
+        self.rows.extend(rows)
+
+
+class AuditLogger(object):
+
+    def __init__(self, sink: AuditSink, spool_path: str = DEFAULT_SPOOL_PATH,
+                 batch_size: int = BATCH_SIZE, flush_interval: float = FLUSH_INTERVAL) -> None:
+        self.sink = sink
+        self.spool = FileSink(spool_path) if spool_path else None
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._retry_at = 0.0
+        # Totals shown in the page's diagnostics panel
+        self.stats = {"batches": 0, "rows": 0, "seconds": 0.0, "failures": 0, "damaged_lines": 0}
+        self._thread = threading.Thread(target=self._drain, name="ipqs-audit-log", daemon=True)
+        self._thread.start()
+
+    def log(self, row: list) -> None:
+        self._queue.put(list(row))
+
+    def flush(self, timeout: float = None) -> bool:
+        """Wait until every queued row has been written or spooled."""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def _next_batch(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _read_spool(self) -> list:
+        if not self.spool or not os.path.exists(self.spool.path):
+            return []
+        rows, damaged = [], []
+        with open(self.spool.path, encoding='utf-8', errors='replace') as handle:
+            for line in handle:
+                if not line.strip():
+                    continue
+                try:
+                    rows.append(json.loads(line))
+                except ValueError:
+                    damaged.append(line.rstrip('\n') + '\n')
+        if damaged:
+            # Set the damaged lines aside once and keep only the readable rows in the spool
+            with open(self.spool.path + '.damaged', 'a', encoding='utf-8') as handle:
+                handle.writelines(damaged)
+            handle, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.spool.path)), suffix='.tmp')
+            with os.fdopen(handle, 'w', encoding='utf-8') as tmp:
+                tmp.writelines(json.dumps(row, default=str) + '\n' for row in rows)
+            os.replace(tmp_path, self.spool.path)
+            self.stats["damaged_lines"] += len(damaged)
+            log_event("audit_spool_damaged", 0.0, lines=len(damaged))
+        return rows
+
+    def _drain(self) -> None:
+        while True:
+            batch = self._next_batch()
+            started = time.perf_counter()
+            ok = False
+            try:
+                if time.monotonic() < self._retry_at:
+                    raise RuntimeError("Audit sink is backing off.")
+                spooled = self._read_spool()
+                self.sink.write(spooled + batch)
+                if spooled:
+                    os.remove(self.spool.path)
+                ok = True
+            except Exception:
+                self._retry_at = time.monotonic() + RETRY_INTERVAL
+                if self.spool:
+                    self.spool.write(batch)
+            finally:
+                seconds = time.perf_counter() - started
+                self.stats["batches"] += 1
+                self.stats["rows"] += len(batch)
+                self.stats["seconds"] += seconds
+                self.stats["failures"] += not ok
+                log_event("audit_write", seconds, rows=len(batch), ok=ok, sink=type(self.sink).__name__)
+                for _ in batch:
+                    self._queue.task_done()
@@ -0,0 +1,204 @@
+"""Several lists validated together as one job.
+
+Every file goes through the same email column detection as a single
+upload. The emails of all files are deduplicated together and submitted
+as one job, so an address shared by several files is checked (and paid
+for) once. The job's verdicts are then joined back onto each file's own
+rows, giving one merged output per source file.
+
+A batch is named and keyed by its files' names and contents, so two
+batches of files that share names but not rows are separate jobs.
+"""
+import hashlib
+import os
+import time
+from dataclasses import dataclass
+
+import pandas as pd
+
+from ipqs.export import export_bytes, export_file_name, export_formats, export_zip
+from ipqs.ingest import Ingest, content_digest
+from ipqs.join import join_results
+from ipqs.metrics import RunMetrics
+from ipqs.neardupe import mailbox_key
+from ipqs.pipeline import finalize_results, list_name, output_name, unique_emails
+from ipqs.rules import VERDICT_COLUMN
+
+
+@dataclass
+class BatchFile:
+    name: str          # file name, made unique within the batch
+    ingest: Ingest
+    emails: pd.Series  # email column, indexed like the file's rows
+    digest: str        # SHA-256 of the file's bytes
+
+    @property
+    def email_column(self) -> str:
+        return self.ingest.email_column
+
+
+@dataclass
+class BatchOverlap:
+    pairs: pd.DataFrame  # one (mailbox key, file) row per file a mailbox is found in, for mailboxes in several files
+
+    @property
+    def count(self) -> int:
+        return int(self.pairs["Email Address"].nunique())
+
+    def per_file(self) -> pd.Series:
+        # Emails each file shares with at least one other file
+        return self.pairs["File"].value_counts()
+
+    def table(self) -> pd.DataFrame:
+        # Rows for the cross-file duplication panel, one per shared email
+        grouped = self.pairs.groupby("Email Address", sort=False)["File"]
+        return pd.DataFrame({"Files": grouped.agg(", ".join), "File Count": grouped.size()}).reset_index()
+
+
+def batch_key(files: list) -> str:
+    """Content key of a batch: the same for the same named files, in any order."""
+    entries = sorted(f"{file.name}\t{file.digest}" for file in files)
+    return hashlib.sha1("\n".join(entries).encode("utf-8")).hexdigest()
+
+
+def batch_name(account_name: str, files: list) -> str:
+    # Stable for the same files, so reruns attach to the running job
+    return f"{account_name}_batch_{len(files)}files_{batch_key(files)[:8]}"
+
+
+def load_batch(sources: list, upload_cache=None) -> tuple:
+    """Detect the email column of every source; returns (files, names of skipped sources).
+
+    With an UploadCache, sources already parsed are taken from it.
+    """
+    files, skipped, seen, opened = [], [], {}, []
+    try:
+        for source in sources:
+            name = os.path.basename(str(source if isinstance(source, (str, os.PathLike)) else source.name))
+            if upload_cache is not None:
+                upload = upload_cache.parse(source)
+                ingest, emails, digest = upload.ingest, upload.emails, upload.digest
+            else:
+                ingest = Ingest(source)
+                opened.append(ingest)
+                emails = ingest.read_emails() if ingest.email_column else None
+                digest = content_digest(source) if ingest.email_column else None
+            if not ingest.email_column:
+                if upload_cache is None:
+                    ingest.close()
+                skipped.append(name)
+                continue
+            # Two files with the same name still get separate outputs
+            seen[name] = seen.get(name, 0) + 1
+            if seen[name] > 1:
+                stem, dot, extension = name.rpartition('.')
+                name = f"{stem} ({seen[name]}){dot}{extension}" if dot else f"{name} ({seen[name]})"
+            files.append(BatchFile(name=name, ingest=ingest, emails=emails, digest=digest))
+    except BaseException:
+        # Nothing is returned, so the workbooks opened so far are closed here
+        for ingest in opened:
+            ingest.close()
+        raise
+    return files, skipped
+
+
+def batch_emails(files: list) -> list:
+    """The unique emails of all files together."""
+    if not files:
+        return []
+    return unique_emails(pd.concat([file.emails for file in files], ignore_index=True))
+
+
+def find_overlap(files: list) -> BatchOverlap:
+    pairs = pd.concat([pd.DataFrame({"Email Address": mailbox_key(file.emails), "File": file.name}) for file in files],
+                      ignore_index=True) if files else pd.DataFrame(columns=["Email Address", "File"])
+    pairs = pairs.dropna(subset=["Email Address"]).drop_duplicates()
+    shared = pairs["Email Address"].duplicated(keep=False)
+    return BatchOverlap(pairs=pairs[shared].reset_index(drop=True))
+
+
+def split_results(files: list, results: pd.DataFrame, columns: list = (VERDICT_COLUMN,), read_rows=None) -> dict:
+    """Join the batch verdicts onto each file's rows; returns {name: (merged rows, unmatched count)}.
+
+    read_rows(file) supplies a file's full rows; it defaults to reading
+    them from the source, and the frame it returns is not modified.
+    """
+    outputs = {}
+    for file in files:
+        rows = read_rows(file) if read_rows else file.ingest.read_rows()
+        df = rows.copy(deep=False)
+        unmatched = join_results(df, file.email_column, results, columns)
+        outputs[file.name] = (df, unmatched)
+    return outputs
+
+
+def output_names(account_name: str, names: list) -> dict:
+    # Export base name of each file's merged output
+    return {name: output_name(list_name(account_name, name)) for name in names}
+
+
+def process_batch(paths: list, account_name: str, job_manager, output_dir: str, fmt: str = 'xlsx',
+                  columns: list = (VERDICT_COLUMN,), on_progress=None, zip_output: bool = False) -> dict:
+    """Validate several files as one job and write one merged output per file; returns a summary."""
+    # The batch is named after its files' contents, so they are loaded before the run's metrics exist
+    started = time.perf_counter()
+    files, skipped = load_batch(paths)
+    name = batch_name(account_name, files)
+    metrics = RunMetrics(account=account_name, file_name=name)
+    rows = sum(len(file.emails.index) for file in files)
+    metrics.record("load_file", time.perf_counter() - started, rows=rows)
+    if not files:
+        return {"batch": name, "status": "SKIPPED", "message": "No email column found in any file.", "skipped": skipped}
+
+    # Every file's workbook is closed on every return and on errors
+    try:
+        overlap = metrics.timed("dedupe", find_overlap, files, rows=rows)
+
+        job_id = job_manager.submit(account_name, name, batch_emails(files), content_key=batch_key(files))
+        job = job_manager.wait(job_id, on_progress=on_progress)
+        results = job_manager.result(job_id)
+        if results is None or results.empty:
+            return {"batch": name, "status": job["status"], "message": job["message"], "skipped": skipped}
+
+        metrics.timed("rules", finalize_results, results, account_name, rows=len(results.index))
+        with metrics.stage("join") as record:
+            outputs = split_results(files, results, columns)
+            record["rows"] = sum(len(df.index) for df, _ in outputs.values())
+    finally:
+        for file in files:
+            file.ingest.close()
+
+    os.makedirs(output_dir, exist_ok=True)
+    base_names = output_names(account_name, list(outputs))
+    # One format for the whole batch: the largest file decides whether xlsx fits
+    largest = max((df for df, _ in outputs.values()), key=lambda df: len(df.index))
+    if fmt not in export_formats(largest):
+        fmt = 'csv'
+    written = []
+    if zip_output:
+        output_path = os.path.join(output_dir, f"{output_name(name)}.zip")
+        frames = {base_names[file_name]: df for file_name, (df, _) in outputs.items()}
+        with open(output_path, 'wb') as handle:
+            handle.write(metrics.timed("export", export_zip, frames, fmt, rows=record["rows"]))
+        written.append(output_path)
+    else:
+        for file_name, (df, _) in outputs.items():
+            output_path = os.path.join(output_dir, export_file_name(base_names[file_name], fmt))
+            with open(output_path, 'wb') as handle:
+                handle.write(metrics.timed("export", export_bytes, df, fmt, rows=len(df.index)))
+            written.append(output_path)
+
+    return {
+        "batch": name,
+        "status": job["status"],
+        "message": job["message"],
+        "outputs": written,
+        "files": [{"file": file_name, "rows": len(df.index), "unmatched": unmatched}
+                  for file_name, (df, unmatched) in outputs.items()],
+        "skipped": skipped,
+        "unique_emails": job["total_emails"],
+        "shared_emails": overlap.count,
+        "cache_hits": job["cache_hits"],
+        "local_rejects": job["local_rejects"],
+        "stages": metrics.summary() + job["metrics"],
+    }
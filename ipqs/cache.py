@@ -0,0 +1,99 @@
+"""Local SQLite store of per-email IPQS results.
+
+Emails validated recently are served from disk so they are not uploaded
+(and charged) again. Entries older than the TTL are ignored, and the
+JobManager deletes them when it starts and after every job.
+"""
+import json
+import os
+import sqlite3
+import time
+from contextlib import closing
+
+import pandas as pd
+
+
+RESULT_EMAIL_COLUMN = "Email Address"
+
+DEFAULT_CACHE_PATH = os.getenv('IPQS_CACHE_PATH', os.path.join('.cache', 'ipqs_verdicts.sqlite3'))
+DEFAULT_TTL_DAYS = float(os.getenv('IPQS_CACHE_TTL_DAYS', '30'))
+
+# SQLite caps the number of bound parameters per statement
+_LOOKUP_CHUNK = 500
+
+
+def cache_key(email) -> str:
+    return str(email).strip().lower()
+
+
+class VerdictCache(object):
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, ttl_days: float = DEFAULT_TTL_DAYS) -> None:
+        self.path = path
+        self.ttl_seconds = ttl_days * 24 * 60 * 60
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS verdicts ("
+                " email TEXT PRIMARY KEY,"
+                " result TEXT NOT NULL,"
+                " validated_at REAL NOT NULL)"
+            )
+            # Expired rows are purged after every job
+            conn.execute("CREATE INDEX IF NOT EXISTS verdicts_validated_at ON verdicts (validated_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def lookup(self, emails) -> tuple:
+        """Split emails into cached result rows and the emails still to validate.
+
+        Returns (cached_df, misses) where cached_df has the IPQS result
+        columns and misses keeps the input order of the uncached emails.
+        """
+        emails = list(emails)
+        keys = list(dict.fromkeys(cache_key(email) for email in emails))
+        cutoff = time.time() - self.ttl_seconds
+
+        found = {}
+        with closing(self._connect()) as conn:
+            for start in range(0, len(keys), _LOOKUP_CHUNK):
+                chunk = keys[start:start + _LOOKUP_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT email, result FROM verdicts WHERE validated_at >= ? AND email IN ({placeholders})",
+                    [cutoff, *chunk],
+                )
+                for email, result in rows:
+                    found[email] = json.loads(result)
+
+        misses = [email for email in emails if cache_key(email) not in found]
+        cached_df = pd.DataFrame.from_records(list(found.values()))
+        return cached_df, misses
+
+    def store(self, results_df: pd.DataFrame) -> int:
+        """Write fresh IPQS result rows back to the cache; returns rows stored."""
+        if results_df.empty or RESULT_EMAIL_COLUMN not in results_df.columns:
+            return 0
+
+        now = time.time()
+        records = json.loads(results_df.to_json(orient="records"))
+        rows = [
+            (cache_key(record[RESULT_EMAIL_COLUMN]), json.dumps(record), now)
+            for record in records
+            if record.get(RESULT_EMAIL_COLUMN)
+        ]
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO verdicts (email, result, validated_at) VALUES (?, ?, ?)",
+                rows,
+            )
+        return len(rows)
+
+    def purge_expired(self) -> int:
+        """Delete rows older than the TTL; returns the rows deleted."""
+        cutoff = time.time() - self.ttl_seconds
+        with closing(self._connect()) as conn, conn:
+            return conn.execute("DELETE FROM verdicts WHERE validated_at < ?", (cutoff,)).rowcount
@@ -0,0 +1,86 @@
+"""Headless batch mode: validate CSV/xlsx lists without the Streamlit UI.
+
+    python -m ipqs --account ACME lists/ extra_list.xlsx --output-dir cleansed/
+
+With --batch, all files are validated as one job: emails shared by
+several files are checked once and each file still gets its own output.
+
+IPQS_API_KEY (and optionally GOOGLE_JSON for the audit sheet) are read
+from the environment, like the page does.
+"""
+import argparse
+import json
+import os
+import sys
+
+from ipqs.audit import AuditLogger, FileSink, SheetsSink
+from ipqs.batch import process_batch
+from ipqs.client import Validate
+from ipqs.jobs import JobManager
+from ipqs.pipeline import iter_input_files, process_file
+from ipqs.rules import VERDICT_COLUMN
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m ipqs", description="Validate email lists with IPQS and write the merged outputs.")
+    parser.add_argument("paths", nargs="+", help="CSV/xlsx files or directories containing them")
+    parser.add_argument("--account", required=True, help="Account name used as the IPQS file name prefix")
+    parser.add_argument("--output-dir", default="output", help="Directory for the merged outputs (default: output)")
+    parser.add_argument("--format", default="xlsx", choices=["xlsx", "csv", "parquet"], help="Output format (default: xlsx)")
+    parser.add_argument("--columns", nargs="*", default=[VERDICT_COLUMN],
+                        help="IPQS result columns to add to each source file (default: the verdict)")
+    parser.add_argument("--batch", action="store_true",
+                        help="Validate all files as one job, deduplicating emails across files")
+    parser.add_argument("--zip", action="store_true", help="With --batch, write the outputs into one zip")
+    parser.add_argument("--quiet", action="store_true", help="Only print the final JSON summary")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+
+    api_key = os.getenv('IPQS_API_KEY')
+    if api_key is None:
+        print("API key not found in the environment (IPQS_API_KEY).", file=sys.stderr)
+        return 2
+    google_json = os.getenv('GOOGLE_JSON')
+
+    audit_logger = AuditLogger(SheetsSink(google_json) if google_json else FileSink(os.path.join('.cache', 'audit_log.jsonl')))
+    # Jobs left running by the web app stay with the web app
+    job_manager = JobManager(Validate(api_key), audit_logger=audit_logger, resume=False)
+    account_name = args.account.upper()
+
+    def on_progress(job):
+        if not args.quiet:
+            print(f"  {job['progress']:3d}% {job['message']}", file=sys.stderr)
+
+    if args.batch:
+        paths = iter_input_files(args.paths)
+        if not args.quiet:
+            print(f"Processing {len(paths)} files as one batch", file=sys.stderr)
+        try:
+            summary = process_batch(paths, account_name, job_manager, args.output_dir, args.format, args.columns,
+                                    on_progress, zip_output=args.zip)
+        except Exception as exc:
+            summary = {"batch": paths, "status": "FAILED", "message": str(exc)}
+        if not args.quiet:
+            print(f"  {summary['status']}: {summary.get('outputs', summary['message'])}", file=sys.stderr)
+        audit_logger.flush(timeout=30)
+        print(json.dumps(summary, indent=2, default=str))
+        return 0 if summary["status"] == "FINISHED" else 1
+
+    summaries = []
+    for path in iter_input_files(args.paths):
+        if not args.quiet:
+            print(f"Processing {path}", file=sys.stderr)
+        try:
+            summary = process_file(path, account_name, job_manager, args.output_dir, args.format, args.columns, on_progress)
+        except Exception as exc:
+            summary = {"file": path, "status": "FAILED", "message": str(exc)}
+        summaries.append(summary)
+        if not args.quiet:
+            print(f"  {summary['status']}: {summary.get('output', summary['message'])}", file=sys.stderr)
+
+    audit_logger.flush(timeout=30)
+    print(json.dumps(summaries, indent=2, default=str))
+    return 0 if all(summary["status"] == "FINISHED" for summary in summaries) else 1
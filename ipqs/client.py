@@ -0,0 +1,153 @@
+"""IPQS email validation API client: bulk CSV jobs and single email lookups.
+
+All instances share one keep-alive requests.Session, every call has
+connect/read timeouts, and throttled or failed calls are retried with
+jittered exponential backoff.
+"""
+import os
+import random
+import threading
+import time
+from urllib.parse import quote
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from ipqs.metrics import count_call
+
+
+# (connect, read) timeouts in seconds
+DEFAULT_TIMEOUT = (5, 60)
+
+# Responses worth retrying: rate limiting and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 4
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 30.0
+
+# Seconds to wait between status checks, per job status. While the status
+# stays the same the interval grows by POLL_GROWTH up to POLL_MAX_INTERVAL.
+POLL_INTERVALS = {
+    "NEW": 2.0,
+    "PROCESSING": 2.0,
+    "UNIQUE_RESULTS": 1.0,
+    "FINALIZING": 0.5,
+}
+POLL_GROWTH = 1.5
+POLL_MAX_INTERVAL = 15.0
+POLL_DEADLINE = float(os.getenv('IPQS_POLL_DEADLINE', '3600'))
+
+FINAL_STATUSES = {"FINISHED", "ERROR"}
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def shared_session() -> requests.Session:
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+    return _session
+
+
+def backoff_delay(attempt: int, retry_after=None) -> float:
+    # Honour Retry-After when the server sends one, otherwise use full jitter
+    if retry_after:
+        try:
+            return min(float(retry_after), BACKOFF_CAP)
+        except ValueError:
+            pass
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+class Validate(object):
+    key = None
+    format = None
+    base_url = None
+
+    def __init__(self, key, format="json", base_url=None, timeout=DEFAULT_TIMEOUT, session=None) -> None:
+        self.key = key
+        self.format = format
+        # IPQS_BASE_URL points the client at a stand-in server (see bench/mock_ipqs.py)
+        self.base_url = base_url or os.getenv('IPQS_BASE_URL') or f"https://www.ipqualityscore.com/api/{self.format}/"
+        self.timeout = timeout
+        self.session = session or shared_session()
+
+    def _request(self, method: str, url: str, idempotent: bool = True, **kwargs) -> dict:
+        for attempt in range(MAX_RETRIES + 1):
+            last_attempt = attempt == MAX_RETRIES
+            count_call()
+            try:
+                response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as exc:
+                # An upload may already have been accepted unless the connection never opened
+                if last_attempt or not (idempotent or isinstance(exc, requests.ConnectTimeout)):
+                    raise
+                time.sleep(backoff_delay(attempt))
+                continue
+
+            retryable = response.status_code == 429 or (idempotent and response.status_code in RETRY_STATUSES)
+            if retryable and not last_attempt:
+                time.sleep(backoff_delay(attempt, response.headers.get("Retry-After")))
+                continue
+            if response.status_code in RETRY_STATUSES:
+                response.raise_for_status()
+            return response.json()
+
+    def upload_csv(self, file_name: str, input_data: list) -> dict:
+        url = f"{self.base_url}csv/upload"
+        headers = {
+            "Content-Type": "application/json"
+        }
+        data = {
+            "type": "email",
+            "file_name": file_name,
+            "key": self.key,
+            "input": input_data
+        }
+        return self._request("POST", url, idempotent=False, headers=headers, json=data)
+
+    def check_status(self, csv_id: str) -> dict:
+        url = f"{self.base_url}csv/{self.key}/status/{csv_id}"
+        return self._request("GET", url)
+
+    def check_email(self, email: str) -> dict:
+        # Real-time lookup of one address against the single email endpoint
+        url = f"{self.base_url}email/{self.key}/{quote(str(email).strip(), safe='@')}"
+        return self._request("GET", url)
+
+    def get_list(self) -> dict:
+        url = f"{self.base_url}csv/{self.key}/list"
+        return self._request("GET", url)
+
+    def poll_status(self, csv_id: str, deadline: float = POLL_DEADLINE):
+        """Yield status responses for a job until it reaches FINISHED or ERROR.
+
+        Sleeps between checks according to the current status and raises
+        TimeoutError once the overall deadline (in seconds) has passed.
+        """
+        started = time.monotonic()
+        previous_status = None
+        interval = 0.0
+        while True:
+            status_response = self.check_status(csv_id)
+            status = status_response.get("status")
+            yield status_response
+            if status in FINAL_STATUSES:
+                return
+
+            if status == previous_status:
+                interval = min(interval * POLL_GROWTH, POLL_MAX_INTERVAL)
+            else:
+                interval = POLL_INTERVALS.get(status, POLL_MAX_INTERVAL)
+            previous_status = status
+
+            remaining = deadline - (time.monotonic() - started)
+            if remaining <= 0:
+                raise TimeoutError(f"IPQS job {csv_id} did not finish within {deadline:.0f} seconds.")
+            time.sleep(min(interval, remaining))
@@ -0,0 +1,79 @@
+"""Duplicate email detection for uploaded lists.
+
+Rows are grouped by mailbox key (case, Gmail dots and +tags folded, see
+ipqs.neardupe) and, unless IPQS_NEAR_DUPLICATES is off, by near-duplicate
+links between the distinct keys. Everything per row is computed once per
+upload with vectorized pandas operations.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from ipqs.neardupe import (MATCH_EXACT, MATCH_MAILBOX, NEAR_DUPLICATES, mailbox_key, near_groups)
+
+
+HIGHLIGHT_STYLE = 'background-color: #FFC7CE'
+
+
+def email_key(emails: pd.Series) -> pd.Series:
+    # Same cleanup the upload applies: strip whitespace, treat blanks as missing
+    key = emails.astype("string").str.strip()
+    return key.mask(key == "")
+
+
+@dataclass
+class DuplicateReport:
+    key: pd.Series         # stripped email per row (<NA> for blanks)
+    mask: pd.Series        # True for every row whose email has a duplicate or near-duplicate
+    group_id: pd.Series    # id shared by rows of the same duplicate group (-1 for blanks)
+    first_seen: pd.Series  # index label of the first row of the same group
+    match: pd.Series       # closest link to another row: Exact, Same mailbox, Typo domain or Similar
+
+    @property
+    def count(self) -> int:
+        return int(self.mask.sum())
+
+    def match_counts(self) -> dict:
+        return self.match[self.mask].value_counts().to_dict()
+
+    def table(self) -> pd.DataFrame:
+        # Rows for the "Email Address Duplication" panel, in file order
+        return pd.DataFrame({
+            'Index': self.mask.index[self.mask.to_numpy()],
+            'Duplicate Email Address': self.key[self.mask].to_numpy(),
+            'First Seen': self.first_seen[self.mask].to_numpy(),
+            'Match': self.match[self.mask].to_numpy(),
+        })
+
+
+def find_duplicates(emails: pd.Series, near: bool = NEAR_DUPLICATES) -> DuplicateReport:
+    key = email_key(emails)
+
+    # factorize gives every distinct email one integer code in a single hash pass
+    exact_codes, _ = pd.factorize(key)
+    mailbox_codes, mailboxes = pd.factorize(mailbox_key(key))
+    present = mailbox_codes >= 0
+
+    if near:
+        # Fuzzy links are found between distinct mailboxes, not rows
+        groups, links = near_groups(mailboxes)
+    else:
+        groups, links = np.arange(len(mailboxes)), np.full(len(mailboxes), None, dtype=object)
+    # A trailing entry for the -1 code of blank rows
+    groups, links = np.append(groups, -1), np.append(links, None)
+    codes = groups[mailbox_codes]
+    group_id = pd.Series(codes, index=emails.index)
+
+    mask = pd.Series(present, index=emails.index) & group_id.duplicated(keep=False)
+
+    exact = present & pd.Series(exact_codes).duplicated(keep=False).to_numpy()
+    mailbox = present & pd.Series(mailbox_codes).duplicated(keep=False).to_numpy()
+    match = np.where(exact, MATCH_EXACT, np.where(mailbox, MATCH_MAILBOX, links[mailbox_codes]))
+    match = pd.Series(match, index=emails.index).where(mask)
+
+    labels = pd.Series(emails.index, index=emails.index)
+    first_seen = labels.groupby(codes).transform('first')
+    first_seen = first_seen.where(present, labels)
+
+    return DuplicateReport(key=key, mask=mask, group_id=group_id, first_seen=first_seen, match=match)
@@ -0,0 +1,65 @@
+"""In-memory export of result frames as xlsx, CSV or Parquet bytes."""
+import io
+from importlib.util import find_spec
+
+import pandas as pd
+
+
+EXPORT_MIME_TYPES = {
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+# Excel sheets hold 1,048,576 rows including the header
+XLSX_MAX_ROWS = 1_048_575
+
+# Checked without importing: the writer is only loaded when an xlsx is first built
+XLSX_ENGINE = 'xlsxwriter' if find_spec('xlsxwriter') else 'openpyxl'
+
+
+def export_formats(df: pd.DataFrame) -> list:
+    formats = ['xlsx', 'csv', 'parquet']
+    if len(df.index) > XLSX_MAX_ROWS:
+        formats.remove('xlsx')
+    return formats
+
+
+def export_file_name(base_name: str, fmt: str) -> str:
+    return f"{base_name}.{fmt}"
+
+
+# infer_dtype kinds that Arrow cannot store as one column type
+MIXED_KINDS = ('mixed', 'mixed-integer')
+
+
+def _mixed_as_strings(df: pd.DataFrame) -> dict:
+    # Only object columns mixing numbers and text (Phone = [5551234, "N/A"]) become strings;
+    # booleans, numbers and text columns keep their types
+    return {name: 'string' for name, column in df.items()
+            if pd.api.types.is_object_dtype(column) and pd.api.types.infer_dtype(column, skipna=True) in MIXED_KINDS}
+
+
+def export_bytes(df: pd.DataFrame, fmt: str) -> bytes:
+    buffer = io.BytesIO()
+    if fmt == 'xlsx':
+        df.to_excel(buffer, index=False, engine=XLSX_ENGINE)
+    elif fmt == 'csv':
+        df.to_csv(buffer, index=False, encoding='utf-8')
+    elif fmt == 'parquet':
+        df.astype(_mixed_as_strings(df)).to_parquet(buffer, index=False)
+    else:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    return buffer.getvalue()
+
+
+def export_zip(frames: dict, fmt: str) -> bytes:
+    """One zip holding every frame of {base_name: df} in fmt."""
+    import zipfile
+    buffer = io.BytesIO()
+    # xlsx and Parquet are compressed already
+    compression = zipfile.ZIP_DEFLATED if fmt == 'csv' else zipfile.ZIP_STORED
+    with zipfile.ZipFile(buffer, 'w', compression=compression) as archive:
+        for base_name, df in frames.items():
+            archive.writestr(export_file_name(base_name, fmt), export_bytes(df, fmt))
+    return buffer.getvalue()
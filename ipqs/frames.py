@@ -0,0 +1,153 @@
+"""Memory-budgeted DataFrame storage for one Streamlit session.
+
+Frames are stored compacted (low-cardinality text as categoricals, other
+text as Arrow-backed strings). When a session goes over its budget, the
+least recently viewed frames are dropped from memory. A frame is written
+to the session's spill directory the first time it is dropped and is
+reloaded by handle on its next view. Spills are pickles, so the index
+(uploads count rows from 1, with gaps where blank rows were dropped) and
+mixed-type spreadsheet columns come back exactly as they were stored.
+Frames that already live on disk as Parquet (job results, stored history
+results) are never written again, only dropped and reloaded.
+"""
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+from dataclasses import dataclass
+
+import pandas as pd
+
+
+
+DEFAULT_BUDGET_MB = float(os.getenv('IPQS_SESSION_BUDGET_MB', '256'))
+DEFAULT_SPILL_DIR = os.getenv('IPQS_SPILL_DIR', os.path.join('.cache', 'sessions'))
+
+# Text columns with at most this share of distinct values become categoricals
+CATEGORY_RATIO = 0.5
+
+try:
+    import pyarrow  # noqa: F401
+    STRING_DTYPE = "string[pyarrow]"
+except ImportError:
+    STRING_DTYPE = "string"
+
+
+def compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Return df with its text columns in compact dtypes."""
+    columns = {}
+    for name, column in df.items():
+        if not (pd.api.types.is_object_dtype(column) or pd.api.types.is_string_dtype(column)):
+            continue
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            continue
+        if pd.api.types.is_object_dtype(column) and pd.api.types.infer_dtype(column, skipna=True) not in ('string', 'empty'):
+            # Mixed values (numbers and text from a spreadsheet) keep their Python objects
+            continue
+        if len(column.index) and column.nunique(dropna=True) <= CATEGORY_RATIO * len(column.index):
+            columns[name] = column.astype('category')
+        elif pd.api.types.is_object_dtype(column):
+            columns[name] = column.astype(STRING_DTYPE)
+    return df.assign(**columns) if columns else df
+
+
+def frame_bytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+@dataclass
+class _Entry:
+    path: str         # file the frame is reloaded from: Parquet, or a pickle when owned
+    owned: bool       # the file was written by this store and is deleted with it
+    rows: int
+    size: int         # in-memory bytes when loaded
+    frame: pd.DataFrame = None
+    viewed_at: float = 0.0
+
+
+class SessionFrames(object):
+
+    def __init__(self, budget_mb: float = DEFAULT_BUDGET_MB, spill_dir: str = DEFAULT_SPILL_DIR) -> None:
+        self.budget = int(budget_mb * 1024 * 1024)
+        os.makedirs(spill_dir, exist_ok=True)
+        self.directory = tempfile.mkdtemp(prefix='session-', dir=spill_dir)
+        self._entries = {}
+        self._lock = threading.Lock()
+        # Spilled files go away with the session
+        self._finalizer = weakref.finalize(self, shutil.rmtree, self.directory, True)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._entries
+
+    def put(self, name: str, df: pd.DataFrame, path: str = None) -> pd.DataFrame:
+        """Store a compacted frame under name and return it.
+
+        path is an existing Parquet copy of df; without one the frame is
+        written to the session's spill directory when it is first evicted.
+        """
+        df = compact_frame(df)
+        with self._lock:
+            self._discard(name)
+            entry = _Entry(path=path, owned=path is None, rows=len(df.index), size=frame_bytes(df),
+                           frame=df, viewed_at=time.monotonic())
+            self._entries[name] = entry
+            self._evict(keep=name)
+        return df
+
+    def get(self, name: str) -> pd.DataFrame:
+        """The frame stored under name, reloaded from disk if it was evicted; None if unknown or gone."""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                return None
+            entry.viewed_at = time.monotonic()
+            if entry.frame is None:
+                try:
+                    entry.frame = pd.read_pickle(entry.path) if entry.owned else compact_frame(pd.read_parquet(entry.path))
+                except (FileNotFoundError, OSError, ValueError):
+                    # The file was evicted from the result store; the caller fetches it again
+                    self._discard(name)
+                    return None
+                entry.size = frame_bytes(entry.frame)
+                self._evict(keep=name)
+            return entry.frame
+
+    def discard(self, name: str) -> None:
+        with self._lock:
+            self._discard(name)
+
+    def memory_bytes(self) -> int:
+        with self._lock:
+            return sum(entry.size for entry in self._entries.values() if entry.frame is not None)
+
+    def summary(self) -> list:
+        """One row per stored frame for the diagnostics panel."""
+        with self._lock:
+            return [{"frame": name, "rows": entry.rows, "in_memory": entry.frame is not None,
+                     "mb": round(entry.size / 1024 / 1024, 2)} for name, entry in self._entries.items()]
+
+    def _discard(self, name: str) -> None:
+        entry = self._entries.pop(name, None)
+        if entry is not None and entry.owned and entry.path and os.path.exists(entry.path):
+            os.remove(entry.path)
+
+    def _spill(self, entry: _Entry) -> None:
+        if entry.path is None:
+            entry.path = os.path.join(self.directory, f"{uuid.uuid4().hex}.pkl")
+            entry.frame.to_pickle(entry.path)
+        entry.frame = None
+
+    def _evict(self, keep: str) -> None:
+        # Drop least recently viewed frames until the session fits; the frame in use stays
+        loaded = sorted((entry.viewed_at, name) for name, entry in self._entries.items()
+                        if entry.frame is not None and name != keep)
+        total = sum(entry.size for entry in self._entries.values() if entry.frame is not None)
+        for _, name in loaded:
+            if total <= self.budget:
+                break
+            entry = self._entries[name]
+            total -= entry.size
+            self._spill(entry)
@@ -0,0 +1,191 @@
+"""Column-pruned ingestion of uploaded CSV/xlsx lists.
+
+The header row is detected from the first few rows only, the dedupe and
+upload path reads just the email column, and the full rows are read once
+when the merged export is built. Sources may be file paths or file-like
+objects such as Streamlit's UploadedFile.
+"""
+import csv
+import hashlib
+import io
+import os
+from contextlib import contextmanager
+
+import pandas as pd
+
+
+EMAIL_COLUMNS = ['Work Email', 'Email', 'Email Address']
+
+# Rows scanned when looking for the header
+HEADER_SCAN_ROWS = 5
+
+# Rows per chunk when a CSV is streamed without pyarrow
+CSV_CHUNK_ROWS = 100_000
+
+try:
+    import pyarrow  # noqa: F401
+    CSV_ENGINE = 'pyarrow'
+except ImportError:
+    CSV_ENGINE = 'c'
+
+
+def get_email_column(columns):
+    for col in EMAIL_COLUMNS:
+        if col in columns:
+            return col
+    return None
+
+
+def file_extension(source) -> str:
+    name = source if isinstance(source, (str, os.PathLike)) else getattr(source, 'name', '')
+    return str(name).rsplit('.', 1)[-1].lower()
+
+
+@contextmanager
+def _open_binary(source):
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as handle:
+            yield handle
+    else:
+        source.seek(0)
+        yield source
+        source.seek(0)
+
+
+def content_digest(source) -> str:
+    """SHA-256 of the source's bytes, read in chunks."""
+    digest = hashlib.sha256()
+    with _open_binary(source) as handle:
+        for chunk in iter(lambda: handle.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _column_names(row) -> list:
+    # Same naming pandas uses for blank and repeated header cells
+    names, seen = [], {}
+    for position, col in enumerate(row):
+        name = str(col).strip() if col is not None and str(col).strip() else f'Unnamed: {position}'
+        if name in seen:
+            seen[name] += 1
+            name = f'{name}.{seen[name]}'
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _trim(row) -> list:
+    # openpyxl pads rows to the sheet dimensions with formatted but empty cells
+    row = list(row)
+    while row and row[-1] in (None, ''):
+        row.pop()
+    return row
+
+
+class Ingest(object):
+    """Header location and email column of one uploaded file."""
+
+    def __init__(self, source, extension: str = None, scan_rows: int = HEADER_SCAN_ROWS) -> None:
+        self.source = source
+        self.extension = extension or file_extension(source)
+        self.header_row = 0
+        self.columns = []
+        self.email_column = None
+        self.email_position = None
+        self._raw_email_column = None
+        self._offsets = [0]
+        self._workbook = None
+
+        # Take the first scanned row that names an email column as the header
+        rows = self._scan_rows(scan_rows)
+        for position, row in enumerate(rows):
+            columns = _column_names(row)
+            email_column = get_email_column(columns)
+            if email_column:
+                self.header_row, self.columns, self.email_column = position, columns, email_column
+                self.email_position = columns.index(email_column)
+                self._raw_email_column = row[self.email_position]
+                break
+        else:
+            if rows:
+                self.columns = _column_names(rows[0])
+
+    def _sheet(self):
+        # One read-only workbook per upload so the shared strings are parsed once
+        if self._workbook is None:
+            from openpyxl import load_workbook
+            with _open_binary(self.source) as handle:
+                data = handle.read()
+            self._workbook = load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+        return self._workbook.worksheets[0]
+
+    def _scan_rows(self, rows: int) -> list:
+        if self.extension == 'csv':
+            with _open_binary(self.source) as handle:
+                lines = handle.read(256 * 1024).split(b'\n')[:rows]
+            # Remember where each line starts so reads can begin at the header
+            self._offsets = [0]
+            for line in lines:
+                self._offsets.append(self._offsets[-1] + len(line) + 1)
+            # utf-8-sig drops the byte order mark Excel puts before the first header cell
+            return [next(csv.reader([line.decode('utf-8-sig', errors='replace').rstrip('\r')]), []) for line in lines]
+        return [_trim(row) for row in self._sheet().iter_rows(max_row=rows, values_only=True)]
+
+    def read_emails(self) -> pd.Series:
+        """Read only the email column, indexed like read_rows()."""
+        if self.email_column is None:
+            return pd.Series(dtype=object)
+
+        if self.extension == 'csv':
+            with _open_binary(self.source) as handle:
+                handle.seek(self._offsets[self.header_row])
+                options = dict(dtype=str)
+                if CSV_ENGINE == 'pyarrow':
+                    # pyarrow only accepts column names in usecols
+                    emails = pd.read_csv(handle, engine='pyarrow', usecols=[self._raw_email_column], **options).iloc[:, 0]
+                else:
+                    chunks = pd.read_csv(handle, usecols=[self.email_position], chunksize=CSV_CHUNK_ROWS, **options)
+                    emails = pd.concat([chunk.iloc[:, 0] for chunk in chunks], ignore_index=True)
+        else:
+            column = self.email_position + 1
+            rows = self._sheet().iter_rows(min_row=self.header_row + 2, min_col=column, max_col=column, values_only=True)
+            values = [row[0] for row in rows]
+            # Stop at the last email rather than the formatted rows below it
+            values = _trim(values)
+            emails = pd.Series(values, dtype=object)
+
+        emails.name = self.email_column
+        emails.index = pd.RangeIndex(1, len(emails) + 1)
+        return emails
+
+    def read_rows(self, nrows: int = None) -> pd.DataFrame:
+        """Read the full rows (or the first nrows) with stripped column names."""
+        if self.extension == 'csv':
+            with _open_binary(self.source) as handle:
+                handle.seek(self._offsets[self.header_row])
+                if nrows is None and CSV_ENGINE == 'pyarrow':
+                    df = pd.read_csv(handle, engine='pyarrow')
+                else:
+                    df = pd.read_csv(handle, nrows=nrows)
+            df.columns = [str(col).strip() for col in df.columns]
+        else:
+            first_row = self.header_row + 2
+            last_row = first_row + nrows - 1 if nrows is not None else None
+            rows = [_trim(row) for row in self._sheet().iter_rows(min_row=first_row, max_row=last_row, values_only=True)]
+            while rows and not rows[-1]:
+                rows.pop()
+            # Like read_excel: trailing empty cells are dropped, values past the header get unnamed columns
+            width = max([len(self.columns), *map(len, rows)])
+            columns = self.columns + [f'Unnamed: {position}' for position in range(len(self.columns), width)]
+            df = pd.DataFrame.from_records(rows, columns=columns or None)
+
+        # Drop rows with all NaN values and adjust the index to start from 1
+        df.dropna(how='all', inplace=True)
+        df.index += 1
+        return df
+
+    def close(self) -> None:
+        if self._workbook is not None:
+            self._workbook.close()
+            self._workbook = None
@@ -0,0 +1,439 @@
+"""Background IPQS validation jobs.
+
+A job covers one uploaded list: the local pre-filter, the cache lookup,
+real-time lookups (small lists) or the sharded upload and polling, and the
+merge of cached and fresh results. Jobs run on worker
+threads owned by a process-wide JobManager. Their state (csv_ids, shard
+statuses, timestamps) is kept in a local SQLite store, so the page only
+reads job state, and jobs survive Streamlit reruns, closed tabs and
+server restarts. A job's email list is only kept while it is active, and
+the merged result files are bounded in size like the ResultStore.
+
+Every job records the process that runs it (host:pid). The web app and
+the CLI share the store, so on start a JobManager only resumes active jobs
+whose process is gone, never one another live process is still running.
+
+A job also records a content key (the upload's digest, or a hash of its
+emails), and a running job is only reused for the same content: two lists
+with the same file name are still separate jobs.
+"""
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from datetime import datetime
+
+import pandas as pd
+
+from ipqs.cache import RESULT_EMAIL_COLUMN, VerdictCache, cache_key
+from ipqs.export import export_bytes
+from ipqs.metrics import AUDIT_METRICS, RunMetrics
+from ipqs.prefilter import PREFILTER_ENABLED, load_blocklist, load_checks, prefilter
+from ipqs.realtime import REALTIME_THRESHOLD, lookup_emails
+from ipqs.results import ResultStore, evict_lru, write_atomic
+from ipqs.shards import SHARD_SIZE, Shard, ShardedRun, split_shards
+
+
+DEFAULT_JOBS_DIR = os.getenv('IPQS_JOBS_DIR', os.path.join('.cache', 'jobs'))
+DEFAULT_JOB_RESULTS_MAX_MB = float(os.getenv('IPQS_JOB_RESULTS_MAX_MB', '512'))
+JOB_WORKERS = int(os.getenv('IPQS_JOB_WORKERS', '4'))
+
+ACTIVE_STATUSES = ("QUEUED", "RUNNING")
+
+# Everything but the email list, which can be tens of megabytes
+JOB_COLUMNS = ("job_id, account, file_name, status, progress, message, total_emails, cache_hits, local_rejects,"
+               " owner, content_key, created_at, updated_at")
+
+
+def nullable_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """df with boolean and integer columns as nullable dtypes.
+
+    Locally rejected rows have no IPQS columns; with nullable dtypes their
+    missing values leave Valid a boolean and Fraud Score an integer rather
+    than turning the columns into objects and floats.
+    """
+    columns = {}
+    for name, column in df.items():
+        if pd.api.types.is_bool_dtype(column):
+            columns[name] = "boolean"
+        elif pd.api.types.is_integer_dtype(column):
+            columns[name] = "Int64"
+    return df.astype(columns) if columns else df
+
+
+def emails_key(emails: list) -> str:
+    """Content key of a list submitted without one: a hash of its emails in order."""
+    return hashlib.sha256("\n".join(emails).encode("utf-8")).hexdigest()
+
+
+def process_owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def owner_alive(owner: str) -> bool:
+    """Whether the process that owns a job may still be running it.
+
+    Jobs from before owners were recorded count as orphaned. Owners on
+    another host are assumed alive, since their process cannot be checked.
+    """
+    host, _, pid = owner.rpartition(':')
+    if not pid.isdigit():
+        return False
+    if host != socket.gethostname():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+# Columns added after the first release; stores created earlier get them on open
+ADDED_JOB_COLUMNS = {
+    "metrics": "TEXT NOT NULL DEFAULT '[]'",
+    "local_rejects": "INTEGER NOT NULL DEFAULT 0",
+    "owner": "TEXT NOT NULL DEFAULT ''",
+    "content_key": "TEXT NOT NULL DEFAULT ''",
+}
+
+
+class JobStore(object):
+    """SQLite persistence for jobs and their shards."""
+
+    def __init__(self, directory: str = DEFAULT_JOBS_DIR, max_result_mb: float = DEFAULT_JOB_RESULTS_MAX_MB) -> None:
+        self.directory = directory
+        self.max_result_bytes = int(max_result_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+        self.path = os.path.join(self.directory, 'jobs.sqlite3')
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " job_id TEXT PRIMARY KEY,"
+                " account TEXT NOT NULL,"
+                " file_name TEXT NOT NULL,"
+                " status TEXT NOT NULL,"
+                " progress INTEGER NOT NULL DEFAULT 0,"
+                " message TEXT NOT NULL DEFAULT '',"
+                " total_emails INTEGER NOT NULL,"
+                " cache_hits INTEGER NOT NULL DEFAULT 0,"
+                " emails TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " updated_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS shards ("
+                " job_id TEXT NOT NULL,"
+                " shard_index INTEGER NOT NULL,"
+                " csv_id TEXT,"
+                " status TEXT NOT NULL,"
+                " attempts INTEGER NOT NULL DEFAULT 0,"
+                " message TEXT NOT NULL DEFAULT '',"
+                " emails TEXT NOT NULL,"
+                " updated_at REAL NOT NULL,"
+                " PRIMARY KEY (job_id, shard_index))"
+            )
+            existing = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for name, definition in ADDED_JOB_COLUMNS.items():
+                if name not in existing:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {definition}")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def result_path(self, job_id: str) -> str:
+        return os.path.join(self.directory, f'{job_id}.parquet')
+
+    def create_job(self, account: str, file_name: str, emails: list, content_key: str = None) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT INTO jobs (job_id, account, file_name, status, total_emails, emails, owner, content_key,"
+                " created_at, updated_at) VALUES (?, ?, ?, 'QUEUED', ?, ?, ?, ?, ?, ?)",
+                (job_id, account.upper(), file_name, len(emails), json.dumps(emails), process_owner(),
+                 content_key or emails_key(emails), now, now),
+            )
+        return job_id
+
+    def update_job(self, job_id: str, **fields) -> None:
+        fields['updated_at'] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(f"UPDATE jobs SET {assignments} WHERE job_id = ?", [*fields.values(), job_id])
+
+    def claim(self, job_id: str, previous_owner: str) -> bool:
+        """Take over an orphaned job; False if another process claimed it first."""
+        with closing(self._connect()) as conn, conn:
+            cursor = conn.execute("UPDATE jobs SET owner = ? WHERE job_id = ? AND owner = ?",
+                                  (process_owner(), job_id, previous_owner))
+            return cursor.rowcount == 1
+
+    def save_shards(self, job_id: str, shards: list) -> None:
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO shards (job_id, shard_index, csv_id, status, attempts, message, emails, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(job_id, shard.index, shard.csv_id, shard.status, shard.attempts, shard.message,
+                  json.dumps(shard.emails), now) for shard in shards],
+            )
+
+    def update_shard(self, job_id: str, shard: Shard) -> None:
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "UPDATE shards SET csv_id = ?, status = ?, attempts = ?, message = ?, updated_at = ?"
+                " WHERE job_id = ? AND shard_index = ?",
+                (shard.csv_id, shard.status, shard.attempts, shard.message, time.time(), job_id, shard.index),
+            )
+
+    def job(self, job_id: str) -> dict:
+        with closing(self._connect()) as conn:
+            row = conn.execute(f"SELECT {JOB_COLUMNS}, metrics FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            job = dict(row)
+            job['metrics'] = json.loads(job['metrics'])
+            job['shards'] = [dict(shard) for shard in conn.execute(
+                "SELECT shard_index, csv_id, status, attempts, message, updated_at FROM shards"
+                " WHERE job_id = ? ORDER BY shard_index", (job_id,))]
+        return job
+
+    def jobs(self, account: str = None, statuses: tuple = None) -> list:
+        query = f"SELECT {JOB_COLUMNS} FROM jobs"
+        clauses, params = [], []
+        if account:
+            clauses.append("account = ?")
+            params.append(account.upper())
+        if statuses:
+            clauses.append(f"status IN ({','.join('?' * len(statuses))})")
+            params.extend(statuses)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        with closing(self._connect()) as conn:
+            return [dict(row) for row in conn.execute(query + " ORDER BY created_at DESC", params)]
+
+    def job_emails(self, job_id: str) -> list:
+        with closing(self._connect()) as conn:
+            return json.loads(conn.execute("SELECT emails FROM jobs WHERE job_id = ?", (job_id,)).fetchone()[0])
+
+    def load_shards(self, job_id: str) -> list:
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT shard_index, csv_id, status, attempts, message, emails FROM shards"
+                " WHERE job_id = ? ORDER BY shard_index", (job_id,))
+            return [Shard(row['shard_index'], json.loads(row['emails']), status=row['status'], attempts=row['attempts'],
+                          csv_id=row['csv_id'], message=row['message']) for row in rows]
+
+    def prune(self) -> int:
+        """Drop the email lists of jobs that are no longer active and evict old result files.
+
+        Returns the result files removed. Job rows are kept for the history.
+        """
+        placeholders = ",".join("?" * len(ACTIVE_STATUSES))
+        with closing(self._connect()) as conn, conn:
+            conn.execute(f"UPDATE jobs SET emails = '[]' WHERE emails != '[]' AND status NOT IN ({placeholders})",
+                         ACTIVE_STATUSES)
+            conn.execute(f"UPDATE shards SET emails = '[]' WHERE emails != '[]' AND job_id IN"
+                         f" (SELECT job_id FROM jobs WHERE status NOT IN ({placeholders}))", ACTIVE_STATUSES)
+        return self._evict_results()
+
+    def _evict_results(self) -> int:
+        # Least recently used result files go first, as in the ResultStore
+        with self._lock:
+            return evict_lru(self.directory, self.max_result_bytes)
+
+
+class JobManager(object):
+    """Runs validation jobs on worker threads and records their state."""
+
+    def __init__(self, validate, store: JobStore = None, verdict_cache: VerdictCache = None,
+                 audit_logger=None, max_workers: int = JOB_WORKERS, shard_size: int = SHARD_SIZE,
+                 resume: bool = True, prefilter: bool = PREFILTER_ENABLED, result_store: ResultStore = None,
+                 realtime_threshold: int = REALTIME_THRESHOLD) -> None:
+        self.validate = validate
+        self.store = store or JobStore()
+        self.verdict_cache = verdict_cache or VerdictCache()
+        self.result_store = result_store or ResultStore()
+        self.audit_logger = audit_logger
+        self.shard_size = shard_size
+        self.prefilter = prefilter
+        self.realtime_threshold = realtime_threshold
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ipqs-job")
+        self._lock = threading.Lock()
+        self._running = set()
+
+        # Pick up jobs that were still running when their process stopped
+        if resume:
+            for job in self.store.jobs(statuses=ACTIVE_STATUSES):
+                if job['owner'] != process_owner() and owner_alive(job['owner']):
+                    continue
+                if self.store.claim(job['job_id'], job['owner']):
+                    self._start(job['job_id'], job['account'], job['file_name'])
+        self._prune()
+
+    def submit(self, account: str, file_name: str, emails: list, content_key: str = None) -> str:
+        """Start a job; content_key identifies the list for find_active() and defaults to a hash of its emails."""
+        emails = list(dict.fromkeys(emails))
+        job_id = self.store.create_job(account, file_name, emails, content_key)
+        self._start(job_id, account, file_name)
+        return job_id
+
+    def job(self, job_id: str) -> dict:
+        return self.store.job(job_id)
+
+    def jobs(self, account: str = None, statuses: tuple = None) -> list:
+        return self.store.jobs(account, statuses)
+
+    def find_active(self, account: str, content_key: str) -> dict:
+        """The account's running job for the same content, whatever its file name."""
+        for job in self.store.jobs(account, ACTIVE_STATUSES):
+            if job['content_key'] == content_key:
+                return job
+        return None
+
+    def wait(self, job_id: str, interval: float = 2.0, on_progress=None) -> dict:
+        """Block until a job leaves the active statuses; returns its final state."""
+        while True:
+            job = self.store.job(job_id)
+            if job["status"] not in ACTIVE_STATUSES:
+                return job
+            if on_progress:
+                on_progress(job)
+            time.sleep(interval)
+
+    def result(self, job_id: str) -> pd.DataFrame:
+        path = self.store.result_path(job_id)
+        try:
+            df = pd.read_parquet(path)
+        except (FileNotFoundError, OSError, ValueError):
+            return None
+        # Reads keep a result at the end of the eviction order
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return df
+
+    def _start(self, job_id: str, account: str, file_name: str) -> None:
+        with self._lock:
+            if job_id in self._running:
+                return
+            self._running.add(job_id)
+        self._executor.submit(self._run, job_id, account, file_name)
+
+    def _prune(self) -> None:
+        # Finished jobs drop their email lists, old result files go and expired verdicts are deleted
+        self.store.prune()
+        self.verdict_cache.purge_expired()
+
+    def _log(self, shard: Shard, run: ShardedRun) -> None:
+        if not self.audit_logger:
+            return
+        upload_response, status_response = shard.upload_response, shard.status_response
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        row = [timestamp, upload_response.get("request_id", ""), run.shard_file_name(shard),
+               shard.csv_id or "", upload_response.get("success", ""), upload_response.get("message", ""),
+               status_response.get("success", ""), status_response.get("status", shard.status),
+               status_response.get("message", shard.message)]
+        if AUDIT_METRICS:
+            row.extend(run.metrics.audit_columns())
+        self.audit_logger.log(row)
+
+    def _log_lookup(self, file_name: str, checked: int, failed: int) -> None:
+        if not self.audit_logger:
+            return
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self.audit_logger.log([timestamp, "", f"{file_name} (real-time)", "", True, f"{checked} emails checked in real time.",
+                               True, "FINISHED", f"{failed} lookups failed." if failed else ""])
+
+    def _run(self, job_id: str, account: str, file_name: str) -> None:
+        metrics = RunMetrics(run_id=job_id, account=account, file_name=file_name)
+        try:
+            emails = self.store.job_emails(job_id)
+
+            # Hopeless emails get a local verdict and are never uploaded
+            with metrics.stage("prefilter", rows=len(emails)):
+                screened = prefilter(emails, load_blocklist(account), checks=load_checks(account) if self.prefilter else ())
+            accepted = screened.accepted
+
+            # Cached verdicts are looked up again on resume; fresh rows were written back as shards finished
+            with metrics.stage("cache_lookup", rows=len(accepted)):
+                cached_df, misses = self.verdict_cache.lookup(accepted)
+            self.store.update_job(job_id, status="RUNNING", cache_hits=len(accepted) - len(misses),
+                                  local_rejects=screened.count, message="Checking the verdict cache.")
+
+            shards = self.store.load_shards(job_id)
+            lookup_df = pd.DataFrame()
+            # Small lists skip the CSV queue; emails whose lookup failed fall back to a CSV job
+            if not shards and 0 < len(misses) <= self.realtime_threshold:
+                def on_lookup(done, total):
+                    self.store.update_job(job_id, progress=int(done * 100 / total),
+                                          message=f"{done} of {total} emails checked in real time.")
+
+                checked = len(misses)
+                with metrics.stage("lookup", rows=checked):
+                    lookup_df, misses = lookup_emails(self.validate, misses, on_progress=on_lookup)
+                if not lookup_df.empty:
+                    self.verdict_cache.store(lookup_df)
+                self._log_lookup(file_name, checked, len(misses))
+
+            if not shards and misses:
+                shards = split_shards(misses, self.shard_size)
+                self.store.save_shards(job_id, shards)
+            fresh_df = pd.DataFrame()
+            failed = []
+            # Shards that finished before a restart are skipped; their rows are already in the verdict cache.
+            # One whose download is no longer in the result store is downloaded again.
+            if any(shard.status != "FINISHED" or shard.csv_id not in self.result_store for shard in shards):
+                def on_change(shard):
+                    # Rows are cached before FINISHED is saved, so a restart in between downloads them again
+                    if shard.status == "FINISHED" and shard.result is not None:
+                        self.verdict_cache.store(shard.result)
+                    self.store.update_shard(job_id, shard)
+
+                run = ShardedRun(self.validate, file_name, [email for shard in shards for email in shard.emails],
+                                 shards=shards, on_change=on_change, metrics=metrics, result_store=self.result_store)
+                fresh_df = run.run(on_progress=lambda percent, message: self.store.update_job(
+                    job_id, progress=percent, message=message))
+                for shard in run.shards:
+                    self._log(shard, run)
+                failed = run.failed
+
+            # Merge cached and fresh rows back into the submitted order
+            with metrics.stage("merge") as record:
+                if not cached_df.empty and not fresh_df.empty and RESULT_EMAIL_COLUMN in fresh_df.columns:
+                    # A shard downloaded again may have cached its rows before the restart
+                    fresh_keys = set(fresh_df[RESULT_EMAIL_COLUMN].map(cache_key))
+                    cached_df = cached_df[~cached_df[RESULT_EMAIL_COLUMN].map(cache_key).isin(fresh_keys)]
+                frames = [nullable_dtypes(frame) for frame in (cached_df, lookup_df, fresh_df, screened.rejected)
+                          if not frame.empty]
+                result = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+                if not result.empty and RESULT_EMAIL_COLUMN in result.columns:
+                    position = {cache_key(email): index for index, email in reversed(list(enumerate(emails)))}
+                    order = result[RESULT_EMAIL_COLUMN].map(lambda email: position.get(cache_key(email), len(position)))
+                    result = result.iloc[order.to_numpy().argsort(kind="stable")].reset_index(drop=True)
+                write_atomic(self.store.result_path(job_id), export_bytes(result, 'parquet'))
+                record["rows"] = len(result.index)
+
+            if failed:
+                message = f"{len(failed)} CSV parts failed: " + "; ".join(shard.message for shard in failed)
+                self.store.update_job(job_id, status="FAILED", progress=100, message=message, metrics=metrics.to_json())
+            else:
+                self.store.update_job(job_id, status="FINISHED", progress=100, message="CSV processing is finished.",
+                                      metrics=metrics.to_json())
+        except Exception as exc:
+            self.store.update_job(job_id, status="FAILED", message=str(exc), metrics=metrics.to_json())
+        finally:
+            with self._lock:
+                self._running.discard(job_id)
+            self._prune()
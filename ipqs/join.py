@@ -0,0 +1,36 @@
+"""Join IPQS results back onto the uploaded source rows."""
+import pandas as pd
+
+from ipqs.cache import RESULT_EMAIL_COLUMN
+from ipqs.neardupe import mailbox_key
+from ipqs.rules import VERDICT_COLUMN
+
+
+def normalize_emails(emails: pd.Series) -> pd.Series:
+    # Join key used on both sides: the mailbox key, so every variant uploaded once gets its verdict
+    return mailbox_key(emails)
+
+
+def join_results(df: pd.DataFrame, email_column: str, results: pd.DataFrame,
+                 columns: list = (VERDICT_COLUMN,)) -> int:
+    """Add the chosen result columns to df in place; returns the unmatched row count.
+
+    Result columns that clash with a source column are prefixed with
+    "IPQS " unless they already carry that prefix.
+    """
+    columns = [col for col in columns if col in results.columns and col != RESULT_EMAIL_COLUMN]
+
+    lookup = results[columns].copy()
+    lookup.index = normalize_emails(results[RESULT_EMAIL_COLUMN])
+    lookup = lookup[lookup.index.notna() & ~lookup.index.duplicated()]
+
+    source_key = normalize_emails(df[email_column])
+    joined = lookup.reindex(source_key.to_numpy())
+    joined.index = df.index
+
+    for col in columns:
+        target = col if col.startswith("IPQS ") or col not in df.columns else f"IPQS {col}"
+        df[target] = joined[col]
+
+    unmatched = source_key.notna() & ~source_key.isin(lookup.index)
+    return int(unmatched.sum())
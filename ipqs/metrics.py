@@ -0,0 +1,121 @@
+"""Per-stage timing and HTTP call counts for a validation run.
+
+A RunMetrics collects, for every named stage (load_file, preview,
+upload_csv, poll, download, export, ...), how often it ran, how long it
+took, the rows it handled and the IPQS HTTP calls it made. Each finished
+stage is also appended as one JSON line to the local metrics log.
+
+HTTP calls are attributed through a thread-local "active stage": the
+client calls count_call() for every request attempt, and it lands on
+whichever stage is open on that thread.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+
+# Set IPQS_METRICS_LOG to an empty string to turn the JSON lines log off
+DEFAULT_METRICS_PATH = os.getenv('IPQS_METRICS_LOG', os.path.join('.cache', 'metrics.jsonl'))
+
+# Append the run's stage timings to every audit log row
+AUDIT_METRICS = os.getenv('IPQS_AUDIT_METRICS', '').lower() in ('1', 'true', 'yes')
+AUDIT_METRICS_STAGES = ("upload_csv", "poll", "download")
+
+_active = threading.local()
+_log_lock = threading.Lock()
+_count_lock = threading.Lock()
+
+
+def count_call(calls: int = 1) -> None:
+    """Attribute HTTP calls to the stage open on the current thread, if any."""
+    record = getattr(_active, "record", None)
+    if record is not None:
+        with _count_lock:
+            record["calls"] += calls
+
+
+def bind_stage(func):
+    """Wrap func so calls it makes on worker threads count toward the stage open here."""
+    record = getattr(_active, "record", None)
+
+    def bound(*args, **kwargs):
+        previous = getattr(_active, "record", None)
+        _active.record = record
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _active.record = previous
+    return bound
+
+
+def log_event(stage: str, seconds: float, path: str = DEFAULT_METRICS_PATH, **fields) -> None:
+    """Append one stage record to the JSON lines metrics log."""
+    if not path:
+        return
+    entry = {"ts": datetime.now().isoformat(timespec="milliseconds"), "stage": stage, "seconds": round(seconds, 4), **fields}
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with _log_lock, open(path, 'a', encoding='utf-8') as handle:
+        handle.write(json.dumps(entry, default=str) + '\n')
+
+
+class RunMetrics(object):
+
+    def __init__(self, path: str = DEFAULT_METRICS_PATH, **context) -> None:
+        # context (run_id, account, file_name, ...) is added to every log line
+        self.path = path
+        self.context = context
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str, rows: int = None, **fields):
+        """Time a block; the yielded record's rows and calls can be set inside it."""
+        record = {"rows": rows, "calls": 0}
+        previous = getattr(_active, "record", None)
+        _active.record = record
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            seconds = time.perf_counter() - started
+            _active.record = previous
+            self.record(name, seconds, record["rows"], record["calls"], **fields)
+
+    def timed(self, name: str, func, *args, rows: int = None, **kwargs):
+        with self.stage(name, rows=rows):
+            return func(*args, **kwargs)
+
+    def record(self, name: str, seconds: float, rows: int = None, calls: int = 0, **fields) -> None:
+        with self._lock:
+            stage = self.stages.setdefault(name, {"count": 0, "seconds": 0.0, "last_seconds": 0.0, "rows": None, "calls": 0})
+            stage["count"] += 1
+            stage["seconds"] += seconds
+            stage["last_seconds"] = seconds
+            stage["calls"] += calls
+            if rows is not None:
+                stage["rows"] = rows
+        log_event(name, seconds, self.path, rows=rows, calls=calls, **self.context, **fields)
+
+    def summary(self) -> list:
+        """One row per stage, in the order the stages first ran."""
+        with self._lock:
+            return [{"stage": name, "count": stage["count"], "seconds": round(stage["seconds"], 4),
+                     "last_seconds": round(stage["last_seconds"], 4), "rows": stage["rows"], "calls": stage["calls"]}
+                    for name, stage in self.stages.items()]
+
+    def to_json(self) -> str:
+        return json.dumps(self.summary())
+
+    def audit_columns(self, stages: tuple = AUDIT_METRICS_STAGES) -> list:
+        # Seconds and HTTP calls per stage, appended to an audit row
+        with self._lock:
+            columns = []
+            for name in stages:
+                stage = self.stages.get(name, {})
+                columns.extend([round(stage.get("seconds", 0.0), 3), stage.get("calls", 0)])
+            return columns
@@ -0,0 +1,259 @@
+"""Near-duplicate email detection.
+
+Exact string comparison misses most of the duplicates that cost credits.
+Addresses are first reduced to a mailbox key: lowercased, with Gmail dots
+and "+tag" sub-addressing removed for the providers that ignore them.
+Addresses sharing a mailbox key reach the same inbox, so only one of them
+is uploaded.
+
+Two weaker links are only reported: a domain a few typos away from a
+common provider (gmial.com -> gmail.com) with the same local part, and
+local parts that are nearly identical at the same domain. The fuzzy
+comparisons run inside small blocks (domain, digits and a local-part
+prefix) rather than over every pair, so the cost stays close to linear.
+"""
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from ipqs.prefilter import bundled_list
+
+
+NEAR_DUPLICATES = os.getenv('IPQS_NEAR_DUPLICATES', '1').lower() not in ('0', 'false', 'no')
+# Minimum fuzz.ratio for two local parts at the same domain to be reported
+SIMILARITY_SCORE = int(os.getenv('IPQS_NEAR_DUPLICATE_SCORE', '90'))
+# Minimum fuzz.ratio between a domain and the common provider it is a typo of
+TYPO_SCORE = 89
+
+# Local parts shorter than this are too ambiguous to compare ("jo" vs "joe")
+MIN_LOCAL_LENGTH = 5
+MIN_DOMAIN_NAME_LENGTH = 4
+BLOCK_PREFIX = 3
+# Blocks above this size are split on a longer local-part prefix
+MAX_BLOCK_SIZE = 200
+# Candidate pairs from many blocks are bounded together, this many at a time
+PAIR_BATCH = 200_000
+
+MATCH_EXACT = "Exact"
+MATCH_MAILBOX = "Same mailbox"
+MATCH_TYPO = "Typo domain"
+MATCH_SIMILAR = "Similar"
+
+DOMAIN_ALIASES = {"googlemail.com": "gmail.com"}
+# Providers that ignore dots in the local part
+DOTLESS_DOMAINS = frozenset(["gmail.com"])
+# Providers that deliver "name+tag@" to "name@"
+PLUS_TAG_DOMAINS = frozenset([
+    "gmail.com", "outlook.com", "hotmail.com", "live.com", "msn.com", "icloud.com", "me.com", "mac.com",
+    "fastmail.com", "protonmail.com", "proton.me",
+])
+
+@lru_cache(maxsize=None)
+def _scorer():
+    # fuzzywuzzy is imported on the first comparison rather than with the page
+    try:
+        from fuzzywuzzy import fuzz
+        return fuzz.ratio
+    except ImportError:
+        from difflib import SequenceMatcher
+
+        def ratio(a: str, b: str) -> int:
+            # Same score fuzzywuzzy computes without python-Levenshtein
+            return int(round(100 * SequenceMatcher(None, a, b).ratio()))
+        return ratio
+
+
+def similarity(a: str, b: str) -> int:
+    return _scorer()(a, b)
+
+
+def split_emails(keys: pd.Series) -> tuple:
+    """(local part, domain) of each address; the domain is <NA> without an "@"."""
+    has_at = keys.str.contains("@", regex=False, na=False)
+    local = keys.str.replace(r"@[^@]*$", "", regex=True)
+    domain = keys.str.replace(r"^.*@", "", regex=True).where(has_at)
+    return local, domain
+
+
+def mailbox_key(emails: pd.Series) -> pd.Series:
+    """Trimmed, lowercased address with provider aliases, Gmail dots and +tags removed."""
+    keys = emails.astype("string").str.strip().str.lower()
+    keys = keys.mask(keys == "")
+    local, domain = split_emails(keys)
+    domain = domain.replace(DOMAIN_ALIASES)
+
+    tagged = domain.isin(PLUS_TAG_DOMAINS).to_numpy(dtype=bool)
+    if tagged.any():
+        local[tagged] = local[tagged].str.replace(r"\+.*$", "", regex=True)
+    dotless = domain.isin(DOTLESS_DOMAINS).to_numpy(dtype=bool)
+    if dotless.any():
+        local[dotless] = local[dotless].str.replace(".", "", regex=False)
+
+    return (local + "@" + domain).where(domain.notna(), keys)
+
+
+def typo_domains(domains) -> dict:
+    """{domain: common provider} for the given distinct domains that look like typos of one."""
+    common = bundled_list('common_domains.txt')
+    candidates = {}
+    for provider in common:
+        candidates.setdefault(provider[0], []).append(provider)
+
+    corrections = {}
+    for domain in domains:
+        if not isinstance(domain, str) or domain in common or len(domain.split('.', 1)[0]) < MIN_DOMAIN_NAME_LENGTH:
+            continue
+        # Typos rarely touch the first letter, so only providers starting with it are compared
+        scored = [(similarity(domain, provider), provider) for provider in candidates.get(domain[0], ())
+                  if abs(len(provider) - len(domain)) <= 2]
+        if scored:
+            score, provider = max(scored)
+            if score >= TYPO_SCORE:
+                corrections[domain] = provider
+    return corrections
+
+
+def _groups(*codes):
+    """Positions sharing every integer code, for groups of two or more.
+
+    Yields one (groups x size) array per group size, positions ascending
+    within each group.
+    """
+    combined = np.zeros(len(codes[0]), dtype=np.int64)
+    if not len(combined):
+        return
+    for column in codes:
+        combined, _ = pd.factorize(combined * (column.max() + 2) + column + 1)
+    sizes = np.bincount(combined)[combined]
+    repeated = np.flatnonzero(sizes > 1)
+    # Grouped by size first, so each size is one contiguous run of whole groups
+    order = repeated[np.lexsort((combined[repeated], sizes[repeated]))]
+    for run in np.split(order, np.flatnonzero(np.diff(sizes[order])) + 1) if len(order) else []:
+        yield run.reshape(-1, sizes[run[0]])
+
+
+def _blocks(local: pd.Series, base: np.ndarray, lengths: np.ndarray):
+    # Blocks by base code and local-part prefix, as (blocks x size) arrays; oversized blocks get a longer prefix
+    positions, prefix = np.arange(len(local.index)), BLOCK_PREFIX
+    while len(positions):
+        oversized = []
+        prefixes = pd.factorize(local.iloc[positions].str.slice(0, prefix))[0]
+        for members in _groups(base[positions], prefixes):
+            members = positions[members]
+            if members.shape[1] <= MAX_BLOCK_SIZE:
+                yield members
+            else:
+                # A longer prefix only splits blocks with local parts longer than the current one
+                oversized.append(members[lengths[members].max(axis=1) > prefix].ravel())
+        positions = np.concatenate(oversized) if oversized else oversized
+        prefix += BLOCK_PREFIX
+
+
+@lru_cache(maxsize=None)
+def _block_pairs(size: int) -> tuple:
+    return np.triu_indices(size, k=1)
+
+
+def _candidate_pairs(blocks):
+    # (a, b) positions of every pair within the blocks, in batches of about PAIR_BATCH
+    firsts, seconds, count = [], [], 0
+    for members in blocks:
+        i, j = _block_pairs(members.shape[1])
+        step = max(PAIR_BATCH // len(i), 1)
+        for start in range(0, len(members), step):
+            rows = members[start:start + step]
+            firsts.append(rows[:, i].ravel())
+            seconds.append(rows[:, j].ravel())
+            count += rows.shape[0] * len(i)
+            if count >= PAIR_BATCH:
+                yield np.concatenate(firsts), np.concatenate(seconds)
+                firsts, seconds, count = [], [], 0
+    if firsts:
+        yield np.concatenate(firsts), np.concatenate(seconds)
+
+
+def _char_counts(texts) -> np.ndarray:
+    # Per-text character counts in 64 buckets; shared buckets only loosen the bound
+    encoded = [text.encode('ascii', 'replace') for text in texts]
+    codes = np.frombuffer(b"".join(encoded), dtype=np.uint8) % 64
+    rows = np.repeat(np.arange(len(encoded)), [len(text) for text in encoded])
+    return np.bincount(rows * 64 + codes, minlength=len(encoded) * 64).reshape(len(encoded), 64).astype(np.uint8)
+
+
+def _similar_pairs(local: pd.Series, domain: pd.Series, score: int):
+    lengths = local.str.len().fillna(0).to_numpy(dtype=int)
+    eligible = np.flatnonzero(domain.notna().to_numpy() & (lengths >= MIN_LOCAL_LENGTH))
+    local, domain, lengths = local.iloc[eligible], domain.iloc[eligible], lengths[eligible]
+    # Addresses differing only in their numbers are usually different people
+    digits = local.str.replace(r"\D+", "", regex=True)
+    base = pd.factorize(domain)[0] * (len(digits.index) + 1) + pd.factorize(digits)[0]
+    texts = local.to_numpy(dtype=object)
+    # ratio = 2 * matches / total length, so long pairs can only score if their lengths are close
+    max_ratio = (200 - score) / score
+    ratio = _scorer()
+    for a, b in _candidate_pairs(_blocks(local, base, lengths)):
+        close = np.maximum(lengths[a], lengths[b]) <= np.minimum(lengths[a], lengths[b]) * max_ratio
+        a, b = a[close], b[close]
+        # Matching characters are at most the shared characters: a cheap bound rules out most pairs
+        members, inverse = np.unique(np.concatenate([a, b]), return_inverse=True)
+        counts = _char_counts(texts[members])
+        shared = np.minimum(counts[inverse[:len(a)]], counts[inverse[len(a):]]).sum(axis=1, dtype=np.int32)
+        bound = 200 * shared >= (score - 0.5) * (lengths[a] + lengths[b])
+        for i, j in zip(a[bound], b[bound]):
+            if ratio(texts[i], texts[j]) >= score:
+                yield eligible[i], eligible[j]
+
+
+def _find(parent: np.ndarray, node: int) -> int:
+    while parent[node] != node:
+        parent[node] = parent[parent[node]]
+        node = parent[node]
+    return node
+
+
+def near_groups(mailboxes: pd.Index, score: int = SIMILARITY_SCORE) -> tuple:
+    """Link distinct mailbox keys that are near-duplicates of each other.
+
+    Returns (group, match): for every key, the position of the first key of
+    its group, and MATCH_TYPO / MATCH_SIMILAR for linked keys (None otherwise).
+    """
+    mailboxes = pd.Series(mailboxes, dtype="string")
+    count = len(mailboxes.index)
+    parent = np.arange(count)
+    match = np.full(count, None, dtype=object)
+    if not count:
+        return parent, match
+
+    local, domain = split_emails(mailboxes)
+
+    # Same local part at a domain that corrects to the same provider
+    corrections = typo_domains(domain.dropna().unique())
+    if corrections:
+        corrected = domain.replace(corrections)
+        typo_keys = mailbox_key(local + "@" + corrected).where(domain.notna(), mailboxes)
+        codes, _ = pd.factorize(typo_keys)
+        first = pd.Series(np.arange(count)).groupby(codes).transform("first").to_numpy()
+        linked = first != np.arange(count)
+        parent[linked] = first[linked]
+        linked_groups = np.unique(first[linked])
+        match[np.isin(first, linked_groups)] = MATCH_TYPO
+        local, domain = split_emails(typo_keys)
+
+    # Nearly identical local parts at the same domain
+    for a, b in _similar_pairs(local, domain, score):
+        root_a, root_b = _find(parent, a), _find(parent, b)
+        if root_a != root_b:
+            parent[max(root_a, root_b)] = min(root_a, root_b)
+        for node in (a, b):
+            if match[node] is None:
+                match[node] = MATCH_SIMILAR
+
+    # Every root is the smallest position of its tree; follow parents until they all reach it
+    group = parent
+    while True:
+        roots = group[group]
+        if np.array_equal(roots, group):
+            return group, match
+        group = roots
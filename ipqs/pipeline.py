@@ -0,0 +1,114 @@
+"""The list-cleansing pipeline shared by the Streamlit page and the CLI.
+
+ingest -> dedupe -> validation job -> verdict rules -> join onto the
+source rows -> export.
+"""
+import os
+from datetime import datetime
+
+import pandas as pd
+
+from ipqs.dedupe import find_duplicates
+from ipqs.export import export_bytes, export_file_name
+from ipqs.ingest import Ingest
+from ipqs.join import join_results
+from ipqs.metrics import RunMetrics
+from ipqs.neardupe import mailbox_key
+from ipqs.prefilter import PREFILTER_COLUMN
+from ipqs.rules import REASON_COLUMN, VERDICT_COLUMN, apply_rules, load_profile
+
+
+INPUT_EXTENSIONS = ('csv', 'xlsx')
+
+
+def list_name(account_name: str, file_name: str) -> str:
+    # IPQS file name for an upload; the history view filters on the account prefix
+    return f"{account_name}_{os.path.basename(str(file_name)).rsplit('.', 1)[0]}"
+
+
+def output_name(name: str) -> str:
+    today_date = datetime.today().strftime("[%Y%m%d_IPQS]")
+    return f"{today_date} {name}"
+
+
+def unique_emails(emails: pd.Series) -> list:
+    emails = emails.dropna().astype(str).str.strip()
+    # Case, Gmail dot and +tag variants reach the same mailbox; only the first is checked
+    return emails[~mailbox_key(emails).duplicated()].tolist()
+
+
+def finalize_results(results: pd.DataFrame, account_name: str) -> pd.DataFrame:
+    # Evaluate the account's validity rules as vectorized masks
+    apply_rules(results, load_profile(account_name))
+    # Rows rejected by the local pre-filter never reached IPQS; keep their local reason
+    if PREFILTER_COLUMN in results.columns:
+        local = results[PREFILTER_COLUMN].notna()
+        results.loc[local, VERDICT_COLUMN] = "Invalid"
+        results.loc[local, REASON_COLUMN] = "Local: " + results.loc[local, PREFILTER_COLUMN].astype(str)
+    return results
+
+
+def iter_input_files(paths: list) -> list:
+    """Expand directories into the CSV/xlsx files they contain."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.rsplit('.', 1)[-1].lower() in INPUT_EXTENSIONS and not name.startswith('~$'):
+                    files.append(os.path.join(path, name))
+        else:
+            files.append(path)
+    return files
+
+
+def process_file(path: str, account_name: str, job_manager, output_dir: str, fmt: str = 'xlsx',
+                 columns: list = (VERDICT_COLUMN,), on_progress=None) -> dict:
+    """Validate one file end to end and write the merged output; returns a summary."""
+    name = list_name(account_name, path)
+    metrics = RunMetrics(account=account_name, file_name=name)
+    ingest = None
+    # The workbook is closed on every return and on errors
+    try:
+        with metrics.stage("load_file") as record:
+            ingest = Ingest(path)
+            if ingest.email_column:
+                emails = ingest.read_emails()
+                record["rows"] = len(emails.index)
+        if not ingest.email_column:
+            return {"file": path, "status": "SKIPPED", "message": "No email column found."}
+
+        duplicates = metrics.timed("dedupe", find_duplicates, emails, rows=len(emails.index))
+
+        job_id = job_manager.submit(account_name, name, unique_emails(emails))
+        job = job_manager.wait(job_id, on_progress=on_progress)
+        results = job_manager.result(job_id)
+        if results is None or results.empty:
+            return {"file": path, "status": job["status"], "message": job["message"]}
+
+        metrics.timed("rules", finalize_results, results, account_name, rows=len(results.index))
+        with metrics.stage("join") as record:
+            df = ingest.read_rows()
+            record["rows"] = len(df.index)
+            unmatched = join_results(df, ingest.email_column, results, columns)
+    finally:
+        if ingest is not None:
+            ingest.close()
+
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = os.path.join(output_dir, export_file_name(output_name(name), fmt))
+    with open(output_path, 'wb') as handle:
+        handle.write(metrics.timed("export", export_bytes, df, fmt, rows=len(df.index)))
+
+    return {
+        "file": path,
+        "status": job["status"],
+        "message": job["message"],
+        "output": output_path,
+        "rows": len(df.index),
+        "unique_emails": job["total_emails"],
+        "duplicates": duplicates.count,
+        "cache_hits": job["cache_hits"],
+        "local_rejects": job["local_rejects"],
+        "unmatched": unmatched,
+        "stages": metrics.summary() + job["metrics"],
+    }
@@ -0,0 +1,164 @@
+"""Local pre-validation of emails before they are sent to IPQS.
+
+Emails that are certain to come back Invalid are rejected locally so they
+never cost a credit: malformed addresses, placeholder domains, disposable
+mailbox domains and the account's own blocklist. Every check is a
+vectorized mask over the whole list.
+
+Per-account blocklists live in the rules file (IPQS_RULES_PATH) next to
+the rule profiles; entries with an "@" block one address, anything else
+blocks a domain and its subdomains::
+
+    {"blocklists": {"ACME": ["competitor.com", "ceo@acme.com"], "*": ["example.org"]}}
+
+Role accounts (info@, sales@) and placeholder addresses at real domains
+(test@gmail.com) can pass the default rule profile, so rejecting them
+changes verdicts. An account opts in to those checks in the same file::
+
+    {"prefilter": {"ACME": ["Role Account", "Placeholder Address"]}}
+
+The "*" entry of either setting applies to every account.
+"""
+import json
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from ipqs.cache import RESULT_EMAIL_COLUMN
+from ipqs.rules import DEFAULT_RULES_PATH
+
+
+# Reason written for locally rejected rows; the verdict rules leave these rows alone
+PREFILTER_COLUMN = "Local Check"
+
+PREFILTER_ENABLED = os.getenv('IPQS_PREFILTER', '1').lower() not in ('0', 'false', 'no')
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+# Checks in the order their reason is reported
+CHECKS = ("Syntax", "Placeholder Domain", "Disposable Domain", "Placeholder Address", "Role Account", "Blocklist")
+# Checks for emails the default rule profile rates Invalid anyway; the others are opt-in per account
+DEFAULT_CHECKS = ("Syntax", "Placeholder Domain", "Disposable Domain", "Blocklist")
+
+# Literal characters rather than \u escapes, which pyarrow's regex engine rejects
+NON_ASCII = "\u0080-\uffff"
+
+# Local part: dot-atoms without leading, trailing or doubled dots. Domain:
+# LDH labels with an alphabetic TLD of at least two characters. Non-ASCII
+# letters are allowed in both for internationalized addresses.
+EMAIL_PATTERN = (
+    rf"[A-Za-z0-9!#$%&'*+/=?^_`{{|}}~{NON_ASCII}-]+(?:\.[A-Za-z0-9!#$%&'*+/=?^_`{{|}}~{NON_ASCII}-]+)*"
+    rf"@(?:[A-Za-z0-9{NON_ASCII}](?:[A-Za-z0-9{NON_ASCII}-]{{0,61}}[A-Za-z0-9{NON_ASCII}])?\.)+"
+    rf"(?:[A-Za-z{NON_ASCII}]{{2,63}}|xn--[A-Za-z0-9-]{{1,59}})"
+)
+MAX_EMAIL_LENGTH = 254
+MAX_LOCAL_LENGTH = 64
+
+PLACEHOLDER_LOCAL_PARTS = frozenset([
+    "asdf", "fake", "n/a", "na", "noemail", "no-email", "none", "null", "qwerty", "test", "unknown", "xxx",
+])
+PLACEHOLDER_DOMAINS = frozenset([
+    "example.com", "example.net", "example.org", "invalid", "localhost", "test.com", "noemail.com",
+])
+
+
+@lru_cache(maxsize=None)
+def bundled_list(name: str) -> frozenset:
+    """Entries of a bundled data file, lowercased, without comments."""
+    with open(os.path.join(DATA_DIR, name), encoding='utf-8') as handle:
+        return frozenset(line.strip().lower() for line in handle if line.strip() and not line.startswith('#'))
+
+
+def _account_setting(key: str, account_name: str, path: str) -> list:
+    # The "*" entries plus the account's own entries of one rules file setting
+    if not path or not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as handle:
+        setting = {name.upper(): entries for name, entries in json.load(handle).get(key, {}).items()}
+    return setting.get('*', []) + setting.get((account_name or '').upper(), [])
+
+
+def load_blocklist(account_name: str = None, path: str = DEFAULT_RULES_PATH) -> list:
+    """The "*" blocklist plus the account's own entries from the rules file."""
+    return _account_setting('blocklists', account_name, path)
+
+
+def load_checks(account_name: str = None, path: str = DEFAULT_RULES_PATH) -> tuple:
+    """DEFAULT_CHECKS plus the checks the account opted in to, in CHECKS order."""
+    extra = _account_setting('prefilter', account_name, path)
+    unknown = [name for name in extra if name not in CHECKS]
+    if unknown:
+        raise ValueError(f"Unknown pre-filter check {unknown[0]!r}.")
+    return tuple(name for name in CHECKS if name in DEFAULT_CHECKS or name in extra)
+
+
+def _domain_in(domains: pd.Series, listed: frozenset) -> pd.Series:
+    # Match the domain itself or any parent domain ("mx.mailinator.com" -> "mailinator.com").
+    # Lists repeat a few thousand domains at most, so the work is done once per distinct domain.
+    codes, uniques = pd.factorize(domains)
+    uniques = pd.Series(uniques, dtype="string")
+    matched = uniques.isin(listed)
+    parents = uniques
+    for _ in range(int(uniques.str.count(r"\.").max() or 0)):
+        parents = parents.str.replace(r"^[^.]*\.", "", regex=True)
+        matched |= parents.isin(listed)
+    return pd.Series(matched.to_numpy()[codes], index=domains.index)
+
+
+@dataclass
+class PrefilterResult:
+    accepted: list
+    rejected: pd.DataFrame  # Email Address and Local Check columns
+
+    @property
+    def count(self) -> int:
+        return len(self.rejected.index)
+
+
+def prefilter(emails: list, blocklist: list = (), checks: tuple = DEFAULT_CHECKS) -> PrefilterResult:
+    """Split emails into the ones worth sending to IPQS and local rejections."""
+    if not emails:
+        return PrefilterResult([], pd.DataFrame(columns=[RESULT_EMAIL_COLUMN, PREFILTER_COLUMN]))
+
+    original = pd.Series(emails, dtype=object)
+    lowered = original.astype("string").str.strip().str.lower().fillna("")
+    # Regex replaces stay vectorized where str.partition builds Python tuples
+    local = lowered.str.replace(r"@[^@]*$", "", regex=True)
+    domain = lowered.str.replace(r"^.*@", "", regex=True)
+    # "+tags" do not change the mailbox a role address points to
+    mailbox = local.str.replace(r"\+.*$", "", regex=True)
+
+    failed = {}
+    if "Syntax" in checks:
+        failed["Syntax"] = (~lowered.str.fullmatch(EMAIL_PATTERN).fillna(False)
+                            | (lowered.str.len() > MAX_EMAIL_LENGTH) | (local.str.len() > MAX_LOCAL_LENGTH))
+    if "Placeholder Domain" in checks:
+        failed["Placeholder Domain"] = domain.isin(PLACEHOLDER_DOMAINS)
+    if "Disposable Domain" in checks:
+        failed["Disposable Domain"] = _domain_in(domain, bundled_list('disposable_domains.txt'))
+    if "Placeholder Address" in checks:
+        failed["Placeholder Address"] = mailbox.isin(PLACEHOLDER_LOCAL_PARTS)
+    if "Role Account" in checks:
+        failed["Role Account"] = mailbox.isin(bundled_list('role_accounts.txt'))
+    if "Blocklist" in checks and blocklist:
+        entries = [str(entry).strip().lower() for entry in blocklist]
+        addresses = frozenset(entry for entry in entries if "@" in entry)
+        domains = frozenset(entry for entry in entries if "@" not in entry)
+        failed["Blocklist"] = lowered.isin(addresses) | _domain_in(domain, domains)
+
+    if not failed:
+        return PrefilterResult(list(emails), pd.DataFrame(columns=[RESULT_EMAIL_COLUMN, PREFILTER_COLUMN]))
+
+    # Report the first failed check in CHECKS order
+    names = list(failed)
+    masks = [failed[name].to_numpy(dtype=bool) for name in names]
+    reason = np.select(masks, names, default="")
+    rejected = reason != ""
+    return PrefilterResult(
+        accepted=original[~rejected].tolist(),
+        rejected=pd.DataFrame({RESULT_EMAIL_COLUMN: original[rejected].to_numpy(),
+                               PREFILTER_COLUMN: reason[rejected]}),
+    )
@@ -0,0 +1,71 @@
+"""Paginated preview of an uploaded list.
+
+Only the requested page of rows is selected and styled, so rendering cost
+depends on the page size rather than the file size. Filtering and sorting
+work on row positions; duplicate highlighting comes from the precomputed
+DuplicateReport mask.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from ipqs.dedupe import HIGHLIGHT_STYLE, DuplicateReport
+
+
+PAGE_SIZES = (50, 100, 250, 500)
+
+
+@dataclass
+class PreviewPage:
+    rows: pd.DataFrame
+    highlight: np.ndarray  # True for rows of `rows` whose email is duplicated
+    page: int
+    pages: int
+    total: int             # rows left after filtering
+
+    def styled(self, email_column: str):
+        # One vectorized style call for the email column of this page only
+        return self.rows.style.apply(lambda _: np.where(self.highlight, HIGHLIGHT_STYLE, ''), subset=[email_column])
+
+
+def _sort_positions(column: pd.Series, positions: np.ndarray, ascending: bool) -> np.ndarray:
+    keys = column.iloc[positions].reset_index(drop=True)
+    try:
+        order = keys.sort_values(ascending=ascending, kind='stable', na_position='last').index
+    except TypeError:
+        # Mixed types in an object column: compare as text
+        order = keys.astype('string').sort_values(ascending=ascending, kind='stable', na_position='last').index
+    return positions[order.to_numpy()]
+
+
+def _duplicate_mask(df: pd.DataFrame, duplicates: DuplicateReport) -> np.ndarray:
+    return duplicates.mask.reindex(df.index, fill_value=False).to_numpy(dtype=bool)
+
+
+def preview_positions(df: pd.DataFrame, duplicates: DuplicateReport, duplicates_only: bool = False,
+                      sort_by: str = None, ascending: bool = True) -> np.ndarray:
+    """Row positions of df after the duplicates filter and sort, across all pages."""
+    positions = np.flatnonzero(_duplicate_mask(df, duplicates)) if duplicates_only else np.arange(len(df.index))
+    if sort_by:
+        positions = _sort_positions(df[sort_by], positions, ascending)
+    return positions
+
+
+def preview_page(df: pd.DataFrame, duplicates: DuplicateReport, page: int = 1, page_size: int = PAGE_SIZES[1],
+                 duplicates_only: bool = False, sort_by: str = None, ascending: bool = True,
+                 positions: np.ndarray = None) -> PreviewPage:
+    """Select one page of df after the duplicates filter and sort.
+
+    positions, when given, are the preview_positions() computed earlier
+    for the same filter and sort.
+    """
+    mask = _duplicate_mask(df, duplicates)
+    if positions is None:
+        positions = preview_positions(df, duplicates, duplicates_only, sort_by, ascending)
+
+    total = len(positions)
+    pages = max(1, -(-total // page_size))
+    page = min(max(int(page), 1), pages)
+    window = positions[(page - 1) * page_size:page * page_size]
+    return PreviewPage(rows=df.iloc[window], highlight=mask[window], page=page, pages=pages, total=total)
@@ -0,0 +1,107 @@
+"""Real-time per-email lookups for small lists.
+
+A CSV job spends most of its time queued at IPQS, which dominates for a
+handful of emails. Lists up to REALTIME_THRESHOLD emails are checked one
+by one against the single email endpoint instead, with a bounded worker
+pool and a shared rate limit. Responses are normalized to the columns of
+the CSV result so the rest of the pipeline cannot tell the modes apart.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+
+from ipqs.cache import RESULT_EMAIL_COLUMN
+from ipqs.metrics import bind_stage
+
+
+# Lists with at most this many emails to check are looked up in real time (0 disables)
+REALTIME_THRESHOLD = int(os.getenv('IPQS_REALTIME_THRESHOLD', '100'))
+REALTIME_WORKERS = int(os.getenv('IPQS_REALTIME_WORKERS', '8'))
+# Requests per second across all workers
+REALTIME_RATE = float(os.getenv('IPQS_REALTIME_RATE', '10'))
+
+# Single email endpoint fields and the CSV result columns they correspond to
+EMAIL_FIELDS = {
+    "valid": "Valid",
+    "disposable": "Disposable",
+    "smtp_score": "SMTP Score",
+    "overall_score": "Overall Score",
+    "generic": "Generic",
+    "common": "Common",
+    "dns_valid": "DNS Valid",
+    "honeypot": "Honeypot",
+    "deliverability": "Deliverability",
+    "frequent_complainer": "Frequent Complainer",
+    "spam_trap_score": "Spam Trap Score",
+    "catch_all": "Catch All",
+    "timed_out": "Timed Out",
+    "suspect": "Suspect",
+    "recent_abuse": "Recent Abuse",
+    "fraud_score": "Fraud Score",
+    "suggested_domain": "Suggested Domain",
+    "leaked": "Leaked",
+}
+
+
+class RateLimiter(object):
+    """Spaces calls at least 1/rate seconds apart across threads."""
+
+    def __init__(self, rate: float) -> None:
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+def result_row(email: str, response: dict) -> dict:
+    """One CSV-shaped result row from a single email response."""
+    row = {"Date": datetime.now().strftime('%Y-%m-%d %H:%M:%S'), RESULT_EMAIL_COLUMN: email}
+    for field, column in EMAIL_FIELDS.items():
+        if field in response:
+            row[column] = response[field]
+    return row
+
+
+def lookup_emails(validate, emails: list, max_workers: int = REALTIME_WORKERS, rate: float = REALTIME_RATE,
+                  on_progress=None) -> tuple:
+    """Check emails one by one; returns (results frame, emails that failed).
+
+    on_progress(done, total) is called from the worker threads.
+    """
+    limiter = RateLimiter(rate)
+    lock = threading.Lock()
+    done = [0]
+
+    def check(email):
+        limiter.wait()
+        try:
+            response = validate.check_email(email)
+        except Exception as exc:
+            response = {"success": False, "message": str(exc)}
+        with lock:
+            done[0] += 1
+            if on_progress:
+                on_progress(done[0], len(emails))
+        return response
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ipqs-lookup") as executor:
+        responses = list(executor.map(bind_stage(check), emails))
+
+    rows, failed = [], []
+    for email, response in zip(emails, responses):
+        if response.get("success"):
+            rows.append(result_row(email, response))
+        else:
+            failed.append(email)
+    return pd.DataFrame(rows), failed
@@ -0,0 +1,116 @@
+"""Local store of finished IPQS CSV results, keyed by csv_id.
+
+A FINISHED job's result never changes, so it is downloaded once and kept
+as a Parquet file. Repeat views are served from disk without touching the
+network. The store is bounded in size; the least recently used files are
+evicted first (reads refresh a file's modification time). The job store
+keeps its merged results with the same atomic writes and eviction.
+"""
+import os
+import re
+import tempfile
+import threading
+
+import pandas as pd
+
+from ipqs.export import export_bytes
+from ipqs.metrics import count_call
+
+
+DEFAULT_RESULTS_DIR = os.getenv('IPQS_RESULTS_DIR', os.path.join('.cache', 'results'))
+DEFAULT_MAX_MB = float(os.getenv('IPQS_RESULTS_MAX_MB', '512'))
+
+
+def write_atomic(path: str, data: bytes) -> None:
+    # Write to a temporary file first so readers never see a partial file
+    handle, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+    try:
+        with os.fdopen(handle, 'wb') as tmp:
+            tmp.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def evict_lru(directory: str, max_bytes: int, suffix: str = '.parquet') -> int:
+    """Delete the least recently used files ending in suffix until directory fits; returns the files removed."""
+    entries = []
+    for name in os.listdir(directory):
+        if not name.endswith(suffix):
+            continue
+        try:
+            stat = os.stat(os.path.join(directory, name))
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, name))
+
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, name in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(os.path.join(directory, name))
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+    return removed
+
+
+class ResultStore(object):
+
+    def __init__(self, directory: str = DEFAULT_RESULTS_DIR, max_mb: float = DEFAULT_MAX_MB) -> None:
+        self.directory = directory
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path(self, csv_id: str) -> str:
+        # csv_ids are numeric, but never let one escape the store directory
+        return os.path.join(self.directory, re.sub(r'[^A-Za-z0-9_-]', '_', str(csv_id)) + '.parquet')
+
+    def __contains__(self, csv_id: str) -> bool:
+        return os.path.exists(self.path(csv_id))
+
+    def get(self, csv_id: str) -> pd.DataFrame:
+        path = self.path(csv_id)
+        try:
+            df = pd.read_parquet(path)
+        except (FileNotFoundError, OSError, ValueError):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return df
+
+    def put(self, csv_id: str, df: pd.DataFrame) -> None:
+        write_atomic(self.path(csv_id), export_bytes(df, 'parquet'))
+        self.evict()
+
+    def download(self, csv_id: str, url: str) -> pd.DataFrame:
+        """Return the stored result, downloading it from url on the first request."""
+        df = self.get(csv_id)
+        if df is None:
+            # pandas fetches the file itself, outside the client session
+            count_call()
+            df = pd.read_csv(url)
+            self.put(csv_id, df)
+        return df
+
+    def fetch(self, csv_id: str, validate) -> pd.DataFrame:
+        """Return a finished job's result, asking IPQS for its link only when it is not stored."""
+        df = self.get(csv_id)
+        if df is not None:
+            return df
+        downloads = validate.check_status(csv_id).get("downloads") or {}
+        if not downloads.get("all"):
+            return None
+        return self.download(csv_id, downloads["all"])
+
+    def evict(self) -> int:
+        """Delete least recently used results until the store fits; returns the files removed."""
+        with self._lock:
+            return evict_lru(self.directory, self.max_bytes)
@@ -0,0 +1,143 @@
+"""Declarative validity rules for IPQS results.
+
+A profile is an ordered list of rules, each describing what a column must
+satisfy for an email to count as Valid. Every rule is evaluated as one
+boolean mask over the whole result frame; rows failing any rule are
+Invalid and the names of the failed rules go to the reason column.
+
+Extra profiles and per-account overrides can be loaded from a JSON file
+(IPQS_RULES_PATH)::
+
+    {
+        "profiles": {
+            "strict": {
+                "extends": "default",
+                "rules": [
+                    {"name": "Fraud Score", "column": "Fraud Score", "op": "le", "value": 75},
+                    {"name": "Catch All", "column": "Catch All", "op": "eq", "value": false, "optional": true}
+                ]
+            }
+        },
+        "accounts": {"ACME": "strict"}
+    }
+
+Rules in a profile replace rules of the same name in the profile it extends.
+"""
+import json
+import os
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+
+VERDICT_COLUMN = "IPQS Validation"
+REASON_COLUMN = "IPQS Validation Reason"
+
+DEFAULT_RULES_PATH = os.getenv('IPQS_RULES_PATH', 'ipqs_rules.json')
+
+OPERATORS = {
+    'eq': lambda column, value: column == value,
+    'ne': lambda column, value: column != value,
+    'lt': lambda column, value: column < value,
+    'le': lambda column, value: column <= value,
+    'gt': lambda column, value: column > value,
+    'ge': lambda column, value: column >= value,
+    'in': lambda column, value: column.isin(value),
+    'not_in': lambda column, value: ~column.isin(value),
+}
+
+_BOOLEAN_STRINGS = {'true': True, 'false': False, '1': True, '0': False}
+
+
+@dataclass
+class Rule:
+    name: str
+    column: str
+    op: str
+    value: object
+    optional: bool = False  # skip instead of failing when the column is missing
+
+    def passes(self, df: pd.DataFrame) -> pd.Series:
+        column = df[self.column]
+        value = self.value
+        if isinstance(value, bool):
+            column = _as_bool(column)
+        elif isinstance(value, (int, float)):
+            column = pd.to_numeric(column, errors='coerce')
+        elif isinstance(value, str):
+            column = column.astype('string').str.lower()
+            value = value.lower()
+        elif isinstance(value, (list, tuple)):
+            column = column.astype('string').str.lower()
+            value = [str(item).lower() for item in value]
+        # Missing values never satisfy a rule
+        return OPERATORS[self.op](column, value).fillna(False).astype(bool)
+
+
+def _as_bool(column: pd.Series) -> pd.Series:
+    if pd.api.types.is_bool_dtype(column):
+        return column
+    return column.astype('string').str.strip().str.lower().map(_BOOLEAN_STRINGS)
+
+
+# The original hardcoded check: not recently abused, valid, not disposable,
+# not a honeypot and no spam trap score
+DEFAULT_PROFILE = [
+    Rule("Recent Abuse", "Recent Abuse", "eq", False),
+    Rule("Valid", "Valid", "eq", True),
+    Rule("Disposable", "Disposable", "eq", False),
+    Rule("Honeypot", "Honeypot", "eq", False),
+    Rule("Spam Trap Score", "Spam Trap Score", "in", ["none"]),
+]
+
+
+def load_profile(account_name: str = None, path: str = DEFAULT_RULES_PATH) -> list:
+    """Return the rule list for an account, falling back to DEFAULT_PROFILE."""
+    if not path or not os.path.exists(path):
+        return list(DEFAULT_PROFILE)
+
+    with open(path, encoding='utf-8') as handle:
+        config = json.load(handle)
+    profiles = config.get('profiles', {})
+    accounts = {name.upper(): profile for name, profile in config.get('accounts', {}).items()}
+    profile_name = accounts.get((account_name or '').upper(), config.get('default_profile', 'default'))
+    return _resolve(profile_name, profiles, seen=())
+
+
+def _resolve(profile_name: str, profiles: dict, seen: tuple) -> list:
+    if profile_name == 'default' and 'default' not in profiles:
+        return list(DEFAULT_PROFILE)
+    if profile_name in seen:
+        raise ValueError(f"Rule profile '{profile_name}' extends itself.")
+    if profile_name not in profiles:
+        raise ValueError(f"Unknown rule profile '{profile_name}'.")
+
+    profile = profiles[profile_name]
+    rules = {}
+    if profile.get('extends'):
+        rules = {rule.name: rule for rule in _resolve(profile['extends'], profiles, seen + (profile_name,))}
+    for spec in profile.get('rules', []):
+        if spec['op'] not in OPERATORS:
+            raise ValueError(f"Unknown rule operator '{spec['op']}' in profile '{profile_name}'.")
+        rule = Rule(**spec)
+        rules[rule.name] = rule
+    return list(rules.values())
+
+
+def apply_rules(df: pd.DataFrame, rules: list = DEFAULT_PROFILE) -> pd.DataFrame:
+    """Add the verdict and reason columns to an IPQS result frame in place."""
+    active = [rule for rule in rules if rule.column in df.columns or not rule.optional]
+
+    # Each failed rule sets one bit, so the reason text is built once per distinct combination
+    failed_bits = np.zeros(len(df.index), dtype=np.int64)
+    for bit, rule in enumerate(active):
+        failed_bits |= (~rule.passes(df).to_numpy()).astype(np.int64) << bit
+
+    reasons = {
+        code: "; ".join(rule.name for bit, rule in enumerate(active) if code >> bit & 1)
+        for code in np.unique(failed_bits).tolist()
+    }
+    df[VERDICT_COLUMN] = np.where(failed_bits == 0, "Valid", "Invalid")
+    df[REASON_COLUMN] = pd.Series(failed_bits, index=df.index).map(reasons)
+    return df
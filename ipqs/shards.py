@@ -0,0 +1,180 @@
+"""Sharded submission of large email lists as parallel IPQS CSV jobs.
+
+The unique emails are split into fixed-size shards, each shard is uploaded
+and polled in its own worker thread, and a shard that fails is resubmitted
+on its own. Finished shard results are merged back in submission order.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from ipqs.cache import RESULT_EMAIL_COLUMN, cache_key
+from ipqs.metrics import RunMetrics
+from ipqs.results import ResultStore
+
+
+SHARD_SIZE = int(os.getenv('IPQS_SHARD_SIZE', '50000'))
+SHARD_WORKERS = int(os.getenv('IPQS_SHARD_WORKERS', '4'))
+SHARD_ATTEMPTS = 3
+
+# Share of a shard's work that is done when it reports each status
+STATUS_PROGRESS = {
+    "PENDING": 0,
+    "UPLOADING": 0,
+    "NEW": 5,
+    "PROCESSING": 50,
+    "UNIQUE_RESULTS": 70,
+    "FINALIZING": 80,
+    "DOWNLOADING": 90,
+    "FINISHED": 100,
+    "FAILED": 100,
+}
+
+
+@dataclass
+class Shard:
+    index: int
+    emails: list
+    status: str = "PENDING"
+    attempts: int = 0
+    csv_id: str = None
+    message: str = ""
+    upload_response: dict = field(default_factory=dict)
+    status_response: dict = field(default_factory=dict)
+    result: pd.DataFrame = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("FINISHED", "FAILED")
+
+
+def split_shards(emails: list, shard_size: int = SHARD_SIZE) -> list:
+    shard_size = max(int(shard_size), 1)
+    return [Shard(index, emails[start:start + shard_size])
+            for index, start in enumerate(range(0, len(emails), shard_size))]
+
+
+class ShardedRun(object):
+
+    def __init__(self, validate, file_name: str, emails: list, shard_size: int = SHARD_SIZE,
+                 max_workers: int = SHARD_WORKERS, max_attempts: int = SHARD_ATTEMPTS,
+                 shards: list = None, on_change=None, metrics: RunMetrics = None,
+                 result_store: ResultStore = None) -> None:
+        self.validate = validate
+        self.file_name = file_name
+        self.emails = list(emails)
+        # Shards restored from a job store keep their csv_id and resume polling
+        self.shards = shards if shards is not None else split_shards(self.emails, shard_size)
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self.on_change = on_change
+        # Stage timings are summed across shards running in parallel
+        self.metrics = metrics or RunMetrics(path=None)
+        self.result_store = result_store or ResultStore()
+        self._lock = threading.Lock()
+
+    def shard_file_name(self, shard: Shard) -> str:
+        if len(self.shards) == 1:
+            return f"{self.file_name}.csv"
+        return f"{self.file_name}_part{shard.index + 1}of{len(self.shards)}.csv"
+
+    def progress(self) -> tuple:
+        """Return (percent, message) summarising every shard."""
+        with self._lock:
+            statuses = [shard.status for shard in self.shards]
+        percent = int(sum(STATUS_PROGRESS.get(status, 0) for status in statuses) / max(len(statuses), 1))
+        finished = statuses.count("FINISHED")
+        failed = statuses.count("FAILED")
+        message = f"{finished} of {len(statuses)} CSV parts finished."
+        if failed:
+            message += f" {failed} failed."
+        return percent, message
+
+    def _set(self, shard: Shard, **changes) -> None:
+        with self._lock:
+            for name, value in changes.items():
+                setattr(shard, name, value)
+        if self.on_change:
+            self.on_change(shard)
+
+    def _run_shard(self, shard: Shard) -> None:
+        # A FINISHED shard whose download is gone from the result store is fetched again
+        if shard.status == "FINISHED" and shard.csv_id in self.result_store:
+            return
+
+        # A shard that was already accepted by IPQS only needs to be polled again
+        resume = shard.csv_id is not None and shard.status not in ("ERROR", "FAILED")
+        while resume or shard.attempts < self.max_attempts:
+            try:
+                if not resume:
+                    self._set(shard, status="UPLOADING", attempts=shard.attempts + 1, csv_id=None)
+                    with self.metrics.stage("upload_csv", rows=len(shard.emails), shard=shard.index):
+                        upload_response = self.validate.upload_csv(self.shard_file_name(shard), [[email] for email in shard.emails])
+                    self._set(shard, upload_response=upload_response)
+                    if not upload_response.get("success"):
+                        self._set(shard, status="ERROR", message=upload_response.get("message", "CSV upload failed."))
+                        continue
+                    self._set(shard, csv_id=upload_response["id"])
+                elif shard.csv_id in self.result_store:
+                    # Finished and downloaded before a restart; nothing left to ask IPQS
+                    self._set(shard, result=self.result_store.get(shard.csv_id), status="FINISHED", message="")
+                    return
+                resume = False
+
+                with self.metrics.stage("poll", shard=shard.index):
+                    for status_response in self.validate.poll_status(shard.csv_id):
+                        status = status_response.get("status") or shard.status
+                        # FINISHED is only recorded once the rows are stored, so a restart never skips unsaved rows
+                        if status == "FINISHED":
+                            status = "DOWNLOADING"
+                        self._set(shard, status=status, status_response=status_response)
+
+                downloads = shard.status_response.get("downloads") or {}
+                if shard.status_response.get("status") == "FINISHED" and downloads.get("all"):
+                    with self.metrics.stage("download", shard=shard.index) as record:
+                        result = self.result_store.download(shard.csv_id, downloads["all"])
+                        record["rows"] = len(result.index)
+                    self._set(shard, result=result, status="FINISHED", message="")
+                    return
+                self._set(shard, status="ERROR", message=shard.status_response.get("message", "No download link available."))
+            except Exception as exc:
+                self._set(shard, status="ERROR", message=str(exc))
+
+        self._set(shard, status="FAILED")
+
+    def run(self, on_progress=None, interval: float = 0.5) -> pd.DataFrame:
+        """Submit every shard and block until all of them finish or fail.
+
+        on_progress(percent, message) is called from the calling thread so
+        it can safely update Streamlit elements.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = {executor.submit(self._run_shard, shard) for shard in self.shards}
+            while pending:
+                _, pending = wait(pending, timeout=interval)
+                if on_progress:
+                    on_progress(*self.progress())
+        return self.merge()
+
+    @property
+    def failed(self) -> list:
+        return [shard for shard in self.shards if shard.status == "FAILED"]
+
+    def merge(self) -> pd.DataFrame:
+        results = [shard.result for shard in self.shards if shard.result is not None]
+        if not results:
+            return pd.DataFrame()
+
+        merged = pd.concat(results, ignore_index=True)
+        if RESULT_EMAIL_COLUMN not in merged.columns:
+            return merged
+
+        # Put the rows back in the order the emails were submitted
+        position = {}
+        for index, email in enumerate(self.emails):
+            position.setdefault(cache_key(email), index)
+        order = merged[RESULT_EMAIL_COLUMN].map(lambda email: position.get(cache_key(email), len(position)))
+        return merged.iloc[order.to_numpy().argsort(kind="stable")].reset_index(drop=True)
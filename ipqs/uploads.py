@@ -0,0 +1,124 @@
+"""Parsed uploads cached by content hash.
+
+Streamlit reruns the page on every widget change with the same uploaded
+bytes. An UploadCache keeps, per content hash, the detected header and
+email column, the email column itself, the duplicate report and the
+preview orderings already computed, so a rerun only hashes the bytes.
+Re-uploading an identical file is a hit as well.
+
+One cache belongs to one session: a ParsedUpload keeps reading its
+source for the full rows, which is not safe to share between sessions.
+The xlsx workbook is closed once the email column is read, and the cache
+is bounded by entries and by the memory its entries hold.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from ipqs.dedupe import DuplicateReport, find_duplicates
+from ipqs.ingest import Ingest, content_digest
+from ipqs.preview import preview_positions
+
+
+UPLOAD_CACHE_ENTRIES = int(os.getenv('IPQS_UPLOAD_CACHE_ENTRIES', '4'))
+# Entries a batch may raise the cache to, one per file
+UPLOAD_CACHE_MAX_ENTRIES = int(os.getenv('IPQS_UPLOAD_CACHE_MAX_ENTRIES', '32'))
+UPLOAD_CACHE_MB = float(os.getenv('IPQS_UPLOAD_CACHE_MB', '128'))
+
+# Filter and sort orderings kept per upload
+PREVIEW_ORDERINGS = 8
+
+
+class ParsedUpload(object):
+
+    def __init__(self, digest: str, ingest: Ingest) -> None:
+        self.digest = digest
+        self.ingest = ingest
+        self.emails = ingest.read_emails() if ingest.email_column else None
+        # The workbook is reopened only if the full rows are read
+        ingest.close()
+        # Uploaded bytes held through the source, plus the email column
+        self._size = int(getattr(ingest.source, 'size', 0) or 0)
+        if self.emails is not None:
+            self._size += int(self.emails.memory_usage(index=True, deep=True))
+        self._duplicates = None
+        self._orderings = OrderedDict()
+
+    def duplicate_report(self) -> DuplicateReport:
+        if self._duplicates is None:
+            self._duplicates = find_duplicates(self.emails)
+            self._size += sum(int(column.memory_usage(index=False, deep=True)) for column in vars(self._duplicates).values())
+        return self._duplicates
+
+    def memory_bytes(self) -> int:
+        return self._size + sum(positions.nbytes for positions in self._orderings.values())
+
+    def preview_positions(self, df: pd.DataFrame, duplicates_only: bool = False, sort_by: str = None,
+                          ascending: bool = True) -> np.ndarray:
+        """preview_positions() for this upload's rows, remembered per filter and sort."""
+        key = (duplicates_only, sort_by, ascending)
+        if key in self._orderings:
+            self._orderings.move_to_end(key)
+        else:
+            self._orderings[key] = preview_positions(df, self.duplicate_report(), duplicates_only, sort_by, ascending)
+            while len(self._orderings) > PREVIEW_ORDERINGS:
+                self._orderings.popitem(last=False)
+        return self._orderings[key]
+
+    @property
+    def name(self) -> str:
+        source = self.ingest.source
+        return os.path.basename(str(source if isinstance(source, (str, os.PathLike)) else getattr(source, 'name', '')))
+
+    def close(self) -> None:
+        self.ingest.close()
+
+
+class UploadCache(object):
+
+    def __init__(self, max_entries: int = UPLOAD_CACHE_ENTRIES, max_mb: float = UPLOAD_CACHE_MB) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def parse(self, source) -> ParsedUpload:
+        """The parsed upload for source's bytes, parsing them only the first time."""
+        digest = content_digest(source)
+        with self._lock:
+            upload = self._entries.get(digest)
+            if upload is not None:
+                self._entries.move_to_end(digest)
+                self.hits += 1
+                return upload
+
+        upload = ParsedUpload(digest, Ingest(source))
+        with self._lock:
+            self.misses += 1
+            self._entries[digest] = upload
+            self._evict()
+        return upload
+
+    def memory_bytes(self) -> int:
+        with self._lock:
+            return sum(upload.memory_bytes() for upload in self._entries.values())
+
+    def summary(self) -> list:
+        """One row per cached upload, in the same shape as SessionFrames.summary()."""
+        with self._lock:
+            return [{"frame": f"upload:{upload.name}", "rows": len(upload.emails.index) if upload.emails is not None else 0,
+                     "in_memory": True, "mb": round(upload.memory_bytes() / 1024 / 1024, 2)}
+                    for upload in self._entries.values()]
+
+    def _evict(self) -> None:
+        # Oldest entries go first; the newest one stays even when it is over the budget alone
+        total = sum(upload.memory_bytes() for upload in self._entries.values())
+        while len(self._entries) > 1 and (len(self._entries) > self.max_entries or total > self.max_bytes):
+            _, evicted = self._entries.popitem(last=False)
+            total -= evicted.memory_bytes()
+            evicted.close()
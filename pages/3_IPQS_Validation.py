@@ -1,14 +1,23 @@
 import streamlit as st
 import pandas as pd
-import json
-import requests
 import os
-from pathlib import Path
 import time
-import gspread
-from google.oauth2 import service_account
+from pathlib import Path
 from datetime import datetime  # Import datetime module correctly
-import base64
+from functools import partial
+from ipqs.audit import AuditLogger, FileSink, SheetsSink
+from ipqs.batch import batch_emails, batch_key, batch_name, find_overlap, load_batch, output_names, split_results
+from ipqs.client import Validate
+from ipqs.export import EXPORT_MIME_TYPES, export_bytes, export_file_name, export_formats, export_zip
+from ipqs.frames import SessionFrames
+from ipqs.jobs import ACTIVE_STATUSES, JobManager
+from ipqs.join import join_results
+from ipqs.metrics import RunMetrics
+from ipqs.pipeline import finalize_results, list_name, output_name, unique_emails
+from ipqs.prefilter import load_checks
+from ipqs.preview import PAGE_SIZES, preview_page
+from ipqs.rules import REASON_COLUMN, VERDICT_COLUMN
+from ipqs.uploads import UPLOAD_CACHE_ENTRIES, UPLOAD_CACHE_MAX_ENTRIES, UploadCache
 
 st.set_page_config(
     page_title="IPQS Validation",
@@ -56,53 +65,52 @@ def main_content():
     if api_key is None:
         raise ValueError("API key not found in the environment.")
 
-    class Validate(object):
-        key = None
-        format = None
-        base_url = None
-
-        def __init__(self, key, format="json") -> None:
-            self.key = key
-            self.format = format
-            self.base_url = f"https://www.ipqualityscore.com/api/{self.format}/"
-
-        def upload_csv(self, file_name: str, input_data: list) -> dict:
-                url = f"{self.base_url}csv/upload"
-                headers = {
-                    "Content-Type": "application/json"
-                }
-                data = {
-                    "type": "email",
-                    "file_name": file_name,
-                    "key": self.key,
-                    "input": input_data
-                }
-                response = requests.post(url, headers=headers, json=data)
-                return response.json()
-
-        def check_status(self, csv_id: str) -> dict:
-            url = f"{self.base_url}csv/{self.key}/status/{csv_id}"
-            response = requests.get(url)
-            return response.json()
-        
-        def get_list(self) -> dict:
-            url = f"{self.base_url}csv/{self.key}/list"
-            response = requests.get(url)
-            return response.json()
-    
     if __name__ == "__main__":
 
         # Initialize the Validate class with your API key
         v = Validate(api_key)
 
-        # Helper function for caching the upload_csv method without 'self'
-        @st.cache_data
-        def cached_upload_csv(file_name: str, input_data: list) -> dict:
-            return v.upload_csv(file_name, input_data)
+        # One audit logger per server process, shared by every session
+        @st.cache_resource
+        def get_audit_logger(google_json):
+            sink = SheetsSink(google_json) if google_json else FileSink(os.path.join('.cache', 'audit_log.jsonl'))
+            return AuditLogger(sink)
+
+        audit_logger = get_audit_logger(google_json)
+
+        # One job manager per server process; jobs keep running across reruns and sessions
+        @st.cache_resource
+        def get_job_manager(api_key, google_json):
+            return JobManager(Validate(api_key), audit_logger=get_audit_logger(google_json))
+
+        job_manager = get_job_manager(api_key, google_json)
+
+        # Finished results are kept on disk by csv_id and shared with the jobs
+        result_store = job_manager.result_store
+
+    # Offer a frame in every export format; the file is only built when its button is clicked
+    def export_buttons(export_df, base_name, label, key):
+        export_format = st.radio("Download format", export_formats(export_df), horizontal=True, key=f"{key}_format")
+        export = partial(st.session_state.metrics.timed, "export", export_bytes, export_df, export_format, rows=len(export_df.index))
+        st.download_button(label=label, data=export,
+                           file_name=export_file_name(base_name, export_format),
+                           mime=EXPORT_MIME_TYPES[export_format], key=f"{key}_download")
+
+    # The credit note for what the local pre-filter rejects; role and placeholder-name checks are opt-in per account
+    check_labels = {"Syntax": "malformed", "Placeholder Domain": "placeholder-domain", "Disposable Domain": "disposable",
+                    "Placeholder Address": "placeholder-name", "Role Account": "role-account", "Blocklist": "blocklisted"}
+
+    def prefilter_note(account_name):
+        if not job_manager.prefilter:
+            return "Every unique address is sent to IPQS; none are rejected locally."
+        labels = [check_labels[check] for check in load_checks(account_name)]
+        listed = ", ".join(labels[:-1]) + " and " + labels[-1] if len(labels) > 1 else labels[0]
+        return f"{listed.capitalize()} addresses are rejected locally and do not use credits."
 
     # Define a function to set all checkbox states to True
     def set_initial_state():
         state.csv_id = None
+        state.job_ids = {}
         st.session_state["ipqs_toggle"] = False
         st.session_state["ipqs_run"] = False
 
@@ -122,11 +130,26 @@ def main_content():
     with st.container(border=True):
         # Add a text input for the company name
         account_name = st.session_state.account_name
-        uploaded_file = st.file_uploader("Upload a file with email column:", type=['csv', 'xlsx'], key=st.session_state["file_uploader_key"], accept_multiple_files=False)
+        uploaded_files = st.file_uploader("Upload one or more files with email column:", type=['csv', 'xlsx'], key=st.session_state["file_uploader_key"], accept_multiple_files=True)
+
+    # One file keeps the step-by-step flow; several files are validated together as one batch
+    uploaded_file = uploaded_files[0] if len(uploaded_files) == 1 else None
+    batch_files = uploaded_files if len(uploaded_files) > 1 else []
+
+    # Stage timings for this session's current file, shown under Diagnostics
+    if 'metrics' not in st.session_state:
+        st.session_state.metrics = RunMetrics(account=account_name)
+    metrics = st.session_state.metrics
+
+    # Uploads and results kept by this session, compacted and held to a memory budget
+    if 'frames' not in st.session_state:
+        st.session_state.frames = SessionFrames()
+    frames = st.session_state.frames
 
-   # Initialize session state if not already done
-    if 'csv_data' not in st.session_state:
-        st.session_state.csv_data = []
+    # Parsed uploads by content hash, so reruns on the same bytes skip parsing and dedupe
+    if 'uploads' not in st.session_state:
+        st.session_state.uploads = UploadCache()
+    uploads = st.session_state.uploads
 
     # Define a function to fetch CSV data if it's not already in session state
     def fetch_csv_data(account_name):
@@ -134,20 +157,11 @@ def main_content():
 
         # Collect relevant CSV information
         csv_data = []
-        csv_df = {}
         for csv in response['csvs']:
             if csv['file_name'].lower().startswith(account_name.lower()):
                 status_url = csv['status_url']
                 csv_id = status_url.split('/status/')[-1]
                 status = csv['status']
-                status_response = v.check_status(csv_id)
-
-                download_link = None
-                if status == "FINISHED":
-                    downloads = status_response.get("downloads")
-                    if downloads and downloads.get("all"):
-                        download_link = downloads['all']
-                        csv_df[csv_id] = pd.read_csv(download_link)
 
                 csv_data.append({
                     "CSV ID": csv_id,
@@ -155,38 +169,53 @@ def main_content():
                     "Status": status
                 })
 
-        return csv_data, csv_df
+        return csv_data
 
     # Check if user has entered an account name
     if account_name:
         # Fetch CSV data only if it's not already in session state
-        if not st.session_state.csv_data:
-            st.session_state.csv_data, st.session_state.csv_df = fetch_csv_data(account_name)
+        if 'csv_data' not in st.session_state:
+            st.session_state.csv_data = fetch_csv_data(account_name)
 
         # Display CSV data in a table
-        if st.session_state.csv_data and st.session_state.csv_df:
+        if st.session_state.csv_data:
             st.dataframe(st.session_state.csv_data, column_config={
                 "CSV ID": st.column_config.TextColumn(width="medium"),
                 "File Name": st.column_config.TextColumn(width="large"),
                 "Status": st.column_config.TextColumn(width="medium")
             })
 
-            st.write(st.session_state.csv_df.keys())
-            # output dict_keys(['994454', '991895', '989960', '985196'])
-
-                # Generate download links for each CSV file
-            for csv_info in st.session_state.csv_data:
-                csv_id = csv_info["CSV ID"]
-                if csv_id in st.session_state.csv_df:
-                    csv_df = st.session_state.csv_df[csv_id]
-                    csv_file = csv_df.to_csv(index=False)
-                    b64 = base64.b64encode(csv_file.encode()).decode()
-                    href = f'<a href="data:file/csv;base64,{b64}" download="{csv_id}.csv">Download CSV</a>'
-                    st.markdown(href, unsafe_allow_html=True)
+            # A job's result is only fetched when it is opened, and from IPQS only the first time
+            finished_ids = [csv["CSV ID"] for csv in st.session_state.csv_data if csv["Status"] == "FINISHED"]
+            opened_csv_id = st.selectbox("Open a finished job:", options=finished_ids, index=None,
+                                         format_func=lambda csv_id: f"{csv_id} (stored locally)" if csv_id in result_store else csv_id)
+            if opened_csv_id:
+                with metrics.stage("download", csv_id=opened_csv_id) as record:
+                    # Recently viewed results stay in memory; older ones are reloaded from the result store
+                    csv_df = frames.get(f"history:{opened_csv_id}")
+                    if csv_df is None:
+                        csv_df = result_store.fetch(opened_csv_id, v)
+                        if csv_df is not None:
+                            csv_df = frames.put(f"history:{opened_csv_id}", csv_df, path=result_store.path(opened_csv_id))
+                    record["rows"] = None if csv_df is None else len(csv_df.index)
+                if csv_df is None:
+                    st.warning(f"No download link available for CSV {opened_csv_id}.")
+                else:
+                    st.dataframe(csv_df, hide_index=True)
+                    export_buttons(csv_df, opened_csv_id, "📄 Download Result", key="history_export")
 
         else:
             st.warning(f"No CSVs found with {account_name} prefix.")
 
+        # Background validation jobs for this account, including ones started in other sessions
+        account_jobs = job_manager.jobs(account_name)
+        if account_jobs:
+            with st.expander(f"Validation jobs ({len(account_jobs)})"):
+                jobs_df = pd.DataFrame(account_jobs)
+                jobs_df["created_at"] = pd.to_datetime(jobs_df["created_at"], unit="s")
+                jobs_df["updated_at"] = pd.to_datetime(jobs_df["updated_at"], unit="s")
+                st.dataframe(jobs_df.drop(columns=["job_id", "account", "owner", "content_key"]), hide_index=True)
+
     # Get the session state
     state = st.session_state
 
@@ -210,6 +239,9 @@ def main_content():
     if "csv_id" not in st.session_state:
         state.csv_id = None
 
+    if "job_ids" not in st.session_state:
+        state.job_ids = {}
+
     if 'submit_button_clicked' not in state:
         state.submit_button_clicked = False
 
@@ -232,83 +264,57 @@ def main_content():
 
         state.uploaded_file = uploaded_file.name
 
-        file_extension = uploaded_file.name.split('.')[-1]  # Get the file extension
-        filename = uploaded_file.name.rsplit('.', 1)[0]
-        filename = f"{account_name}_{filename}"
+        filename = list_name(account_name, uploaded_file.name)
 
-        st.write(filename)
+        # Start a fresh set of stage timings for each new file
+        if metrics.context.get("file_name") != filename:
+            metrics = state.metrics = RunMetrics(account=account_name, file_name=filename)
 
-        def load_file():
-            def get_email_column(columns):
-                for col in ['Work Email', 'Email', 'Email Address']:
-                    if col in columns:
-                        return col
-                return None
-
-            if file_extension.lower() == 'csv':
-                uploaded_file.seek(0)
-                df = pd.read_csv(uploaded_file)
-                df.columns = [str(col).strip() for col in df.columns]
-                email_column = get_email_column(df.columns)
-                return df, df.copy(), email_column
-
-            df = pd.read_excel(uploaded_file, skiprows=1)
-            df.columns = [str(col).strip() for col in df.columns]
-            email_column = get_email_column(df.columns)
-
-            if not email_column:
-                df = pd.read_excel(uploaded_file)
-                df.columns = [str(col).strip() for col in df.columns]
-                email_column = get_email_column(df.columns)
-                if not email_column:
-                    st.warning("Please check that the uploaded file is correct. The file must have an email column to proceed.")
-
-            return df, df.copy(), email_column
-        
-        # Call the load_file function to get the DataFrames
-        df, df1, email_column = load_file()
-
-        # Drop rows with all NaN values from df and df1
-        df.dropna(how='all', inplace=True)
-        df1.dropna(how='all', inplace=True)
+        st.write(filename)
 
-        # Adjust the index to start from 1
-        df.index += 1
+        # Locate the header from the first rows and read only the email column, once per file content
+        with metrics.stage("load_file") as record:
+            upload = uploads.parse(uploaded_file)
+            ingest = upload.ingest
+            email_column = ingest.email_column
+            if email_column:
+                emails = upload.emails
+                record["rows"] = len(emails.index)
+        if not email_column:
+            st.warning("Please check that the uploaded file is correct. The file must have an email column to proceed.")
 
         if email_column: 
-            # Initialize an empty list to store duplicate values
-            duplicate_values = []
-
-            # Define a function to highlight duplicate rows and store duplicate values
-            def highlight_duplicates(row):
-                # Check if the email in the current row is duplicated in the DataFrame
-                email = row[email_column]
-                is_duplicate = df[email_column].duplicated(keep=False) & (df[email_column] == email)
-                
-                # If it's a duplicate, store its values in a list
-                if is_duplicate.any():
-                    duplicate_values.append(email)
-
-                # Return the background color for the email column based on whether it's a duplicate or not
-                return ['background-color: #FFC7CE' if (col == email_column and is_duplicate.any()) else '' for col in row.index]
-
-            # Apply the custom style function to the DataFrame
-            styled_df = df.style.apply(highlight_duplicates, axis=1)
-
-            # Set custom table styles for autofitting the table to the data
-            table_styles = [
-                dict(selector="table", props=[("width", "100%"), ("table-layout", "auto")]),
-                dict(selector="th, td", props=[("white-space", "nowrap"), ("overflow", "hidden"), ("text-overflow", "ellipsis")])
-            ]
-            
-            # Apply custom table styles to the styled DataFrame
-            styled_df = styled_df.set_table_styles(table_styles)
-
-            # Render the styled DataFrame with custom styling
+            # Compute the duplicate mask, group ids and first-seen rows once per upload
+            duplicates = metrics.timed("dedupe", upload.duplicate_report, rows=len(emails.index))
+
+            # Full rows are read once per upload and shared by the preview and the merged export
+            if state.get("source_rows_id") != upload.digest or "source_rows" not in frames:
+                with metrics.stage("read_rows") as record:
+                    source_rows = frames.put("source_rows", ingest.read_rows())
+                    ingest.close()
+                    record["rows"] = len(source_rows.index)
+                state.source_rows_id = upload.digest
+            source_rows = frames.get("source_rows")
+
             st.markdown('###')
             st.subheader("Raw Data Preview", divider='grey')
-            st.write("Total Contacts: ", len(df.index))
-            st.dataframe(styled_df, use_container_width=True)
+            st.write("Total Contacts: ", int(emails.notna().sum()))
+
+            # Filter, sort and page on the server; only the visible page is styled and sent
+            filter_col, sort_col, order_col, size_col, page_col = st.columns([2, 3, 2, 2, 2])
+            duplicates_only = filter_col.toggle("Duplicates only", key="preview_duplicates_only", disabled=not duplicates.count)
+            sort_by = sort_col.selectbox("Sort by", list(source_rows.columns), index=None, placeholder="File order", key="preview_sort_by")
+            ascending = order_col.radio("Order", ["Ascending", "Descending"], key="preview_order", disabled=sort_by is None) == "Ascending"
+            page_size = size_col.selectbox("Rows per page", PAGE_SIZES, index=1, key="preview_page_size")
+            page_number = page_col.number_input("Page", min_value=1, step=1, key="preview_page")
+
+            with metrics.stage("preview", rows=len(source_rows.index)) as record:
+                # The filtered and sorted order is kept with the upload; paging only slices it
+                positions = upload.preview_positions(source_rows, duplicates_only, sort_by, ascending)
+                preview = preview_page(source_rows, duplicates, page_number, page_size, positions=positions)
+                record["rows"] = len(preview.rows.index)
+                st.dataframe(preview.styled(email_column), use_container_width=True)
+            st.caption(f"Page {preview.page:,} of {preview.pages:,} · {preview.total:,} rows")
 
             def resetbutton():
                 state.button_clicked = False
@@ -319,10 +325,6 @@ def main_content():
                 st.write("Checking in progress...")  # Display a message indicating that the process is running
                 state.button_clicked = True
                 st.session_state.key += 1
-                status = st.progress(0)
-                for t in range(10):
-                    time.sleep(.2)
-                    status.progress(10 * t + 10)
                 set_initial_state()
                 st.rerun()
     
@@ -330,21 +332,16 @@ def main_content():
     # Perform the checks only if the process button is clicked
     if uploaded_file and email_column and state.button_clicked:
 
-        if duplicate_values:
+        if duplicates.count:
 
             with st.container(border=True):
                 st.markdown("##### Email Address Duplication")
 
-                duplicate_emails = []
-
-                for index, row in df.iterrows():
-                    email = str(row[email_column]).strip()  # Convert to string to handle float values
-                    if email in duplicate_values:
-                        duplicate_emails.append((index, email))
-            
-                # Convert the list of tuples to a DataFrame
-                df_duplicate_indices = pd.DataFrame(duplicate_emails, columns=['Index', 'Duplicate Email Address'])
-                st.warning(f"Total {len(duplicate_emails)} duplicate email addresses found.")
+                df_duplicate_indices = duplicates.table()
+                match_counts = ", ".join(f"{count} {match.lower()}" for match, count in duplicates.match_counts().items())
+                st.warning(f"Total {duplicates.count} duplicate email addresses found ({match_counts}).")
+                st.caption("Exact and same-mailbox duplicates (case, Gmail dots, +tags) are checked once. "
+                           "Typo-domain and similar addresses are only flagged for review.")
 
                 st.dataframe(df_duplicate_indices, hide_index=True)
 
@@ -362,11 +359,12 @@ def main_content():
                     st.info("📥 Are you sure to proceed?")
                     st.write('⚠️ Please note:')
                     st.markdown(
-                        '''
-                        1. Only unique email addresses will be checked during this validation. (Duplicate emails have been removed to avoid multiple checks)
+                        f'''
+                        1. Only unique email addresses will be checked during this validation. (Duplicate emails, including case, Gmail dot and +tag variants of the same mailbox, have been removed to avoid multiple checks)
                         2. Each email address validation will consume one credit under the 2X IPQS account.
                         3. Expect a longer processing time if there are many email addresses to validate.
                         4. Please ensure that the file you are working on is correct before proceeding.
+                        5. {prefilter_note(account_name)}
                         '''
                     )
 
@@ -374,181 +372,244 @@ def main_content():
                         #st.cache_data.clear()
                         state.ipqs_disabled = True
 
-                    @st.cache_data(experimental_allow_widgets=True)
                     def ipqs_validation():
+                        # Start a background job for this file, or attach to the one already running for the same bytes
+                        job_id = state.job_ids.get(filename)
+                        if job_id is not None and job_manager.job(job_id)["content_key"] != upload.digest:
+                            # The file changed but kept its name
+                            job_id = None
+                        if job_id is None:
+                            active_job = job_manager.find_active(account_name, upload.digest)
+                            if active_job:
+                                job_id = active_job["job_id"]
+                            else:
+                                job_id = job_manager.submit(account_name, filename, unique_emails(emails), content_key=upload.digest)
+                            state.job_ids[filename] = job_id
+                        return job_id
+
+                    # Re-read the job state every few seconds without rerunning the whole page
+                    @st.fragment(run_every=2)
+                    def job_progress(job_id):
+                        job = job_manager.job(job_id)
+                        if job["status"] in ACTIVE_STATUSES:
+                            st.progress(job["progress"], text=job["message"] or "Operation in progress. Please wait.")
+                        else:
+                            st.rerun()
 
-                        # Function to update progress and status
-                        def update_progress(status_message, progress_percent):
-                            my_bar.progress(progress_percent, text=status_message)
-
-                        def log_entry_to_google_sheets(timestamp, request_id, filename, csv_id, upload_success, upload_message, status_success, status, status_message):
-                            
-                            service_account_info = json.loads(google_json)
-
-                            # Create credentials object from service account credentials json
-                            credentials = service_account.Credentials.from_service_account_info(service_account_info)
-
-                            # Assign API scope to credentials
-                            scope = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
-                            creds_with_scope = credentials.with_scopes(scope)
-
-                            # Create a new client with scoped credentials
-                            client = gspread.authorize(creds_with_scope)
-
-                            # Read spreadsheets data into a DataFrame
-                            spreadsheet = client.open_by_url('https://docs.google.com/spreadsheets/d/11CZgEFDvJP7RzlD736WWiOaky7_VL1r3omX2lihNYAw/edit#gid=0')
-
-                            # Get the first worksheet using index 0
-                            worksheet = spreadsheet.get_worksheet(0)
-
-                            # Log the entry
-                            log_entry = [timestamp, request_id, filename, csv_id, upload_success, upload_message, status_success, status, status_message]
-                            worksheet.append_row(log_entry)
-
-                        filename = uploaded_file.name.rsplit('.', 1)[0]
-                        filename = f"{account_name}_{filename}"
-
-                        filtered_df = df1.dropna(subset=[email_column])
-                        filtered_df[email_column] = filtered_df[email_column].str.strip()
-                        filtered_df = filtered_df.drop_duplicates(subset=[email_column])
-
-                        # Define status messages and progress percentages
-                        progress = {
-                            "NEW": ("CSV is waiting to begin processing.", 0),
-                            "PROCESSING": ("CSV is currently processing through records.", 50),
-                            "UNIQUE_RESULTS": ("CSV is currently being uniqued to remove duplicate records.", 70),
-                            "FINALIZING": ("CSV is currently undergoing final checks before processing completes.", 80),
-                            "FINISHED": ("CSV processing is finished.", 100),
-                            "ERROR": ("CSV processing encountered an error. Please check again later.", 0)
-                        }
-
-                        # Initialize progress bar
-                        progress_text = "Operation in progress. Please wait."
-                        my_bar = st.progress(0, text=progress_text)
-
-                        # Step 1: Upload CSV
-                        csv_upload_response = cached_upload_csv(f"{filename}.csv", filtered_df[[email_column]].values.tolist())
-
-                        if csv_upload_response["success"]:
-                            csv_id = csv_upload_response["id"]
-                            state.csv_id = csv_upload_response["id"]
-
-                            # Continuously check status until processing is finished
-                            while True:
-                                status_response = v.check_status(csv_id)
-                                status = status_response.get("status")
-
-                                status_message, progress_percent = progress.get(status, ("Unknown status", 0))
-                                update_progress(status_message, progress_percent)
-                                # Log entry to Google Sheets
-                                timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-
-                                if status == "FINISHED":
-                                    st.success("CSV processing is finished.")
-                                    downloads = status_response.get("downloads")
-                                    if downloads and downloads.get("all"):
-                                        download_link = downloads["all"]
-                                        log_entry_to_google_sheets(timestamp, csv_upload_response["request_id"], filename , csv_id, csv_upload_response["success"], csv_upload_response["message"], status_response["success"], status_response["status"], status_response["message"])
-                                    else:
-                                        st.warning("No download link available yet. Please check again later.")
-                                        log_entry_to_google_sheets(timestamp, csv_upload_response["request_id"], filename , csv_id, csv_upload_response["success"], csv_upload_response["message"], status_response["success"], status_response["status"], status_response["message"])
-                                
-                                    time.sleep(1)  # Wait for 1 second before clearing the progress bar
-                                    my_bar.empty()  # Clear the progress bar
-
-                                    break  # Exit the loop once processing is finished
-                                elif status == "ERROR":
-                                    st.error("CSV processing encountered an error. Please check again later.")
-                                    log_entry_to_google_sheets(timestamp, csv_upload_response["request_id"], filename , csv_id, csv_upload_response["success"], csv_upload_response["message"], status_response["success"], status_response["status"], status_response["message"])
-                                    break  # Exit the loop if an error occurs
+                    if st.button("Yes, I want to proceed", disabled=state.ipqs_disabled, key='ipqs_run_button', on_click=ipqs_disable):
+                        state.ipqs_button_clicked = True
+                        st.rerun()
+
+                    if state.ipqs_button_clicked:
+                        job_id = ipqs_validation()
+                        job = job_manager.job(job_id)
+                        state.csv_id = next((shard["csv_id"] for shard in job["shards"] if shard["csv_id"]), None)
+                        ipqs_validation_df = None
+
+                        if job["status"] in ACTIVE_STATUSES:
+                            job_progress(job_id)
                         else:
-                            st.error("CSV upload failed.")
-                            st.error(f"Error message: {csv_upload_response['message']}")
-                            log_entry_to_google_sheets(timestamp, csv_upload_response["request_id"], filename , "", csv_upload_response["success"], csv_upload_response["message"], "", "", "")
-                    
-                        if download_link:
+                            if job["total_emails"]:
+                                cache_hits = job["cache_hits"]
+                                st.info(f"Verdict cache: {cache_hits} of {job['total_emails']} emails ({cache_hits / job['total_emails']:.0%}) served locally, {cache_hits} credits saved.")
+                            if job["local_rejects"]:
+                                st.info(f"Local pre-filter: {job['local_rejects']} emails rejected without being uploaded.")
+                            if job["status"] == "FAILED":
+                                st.error(job["message"])
+                            else:
+                                st.success("CSV processing is finished.")
+
+                            # Job results are on disk already, so eviction only drops them from memory
+                            ipqs_validation_df = frames.get(f"job:{job_id}")
+                            if ipqs_validation_df is None:
+                                job_result = job_manager.result(job_id)
+                                if job_result is not None:
+                                    ipqs_validation_df = frames.put(f"job:{job_id}", job_result,
+                                                                    path=job_manager.store.result_path(job_id))
+                                elif job["status"] == "FINISHED":
+                                    # Old job results are evicted; a new job is mostly served from the verdict cache
+                                    st.warning("This job's result is no longer stored. Run the validation again to rebuild it.")
+                                    state.job_ids.pop(filename, None)
+                                    state.ipqs_button_clicked = False
+                                    state.ipqs_disabled = False
+                            if ipqs_validation_df is not None:
+                                # The verdict columns are added to a view, not to the stored frame
+                                ipqs_validation_df = ipqs_validation_df.copy(deep=False)
+
+                        if ipqs_validation_df is not None and not ipqs_validation_df.empty:
                             st.subheader("IPQS Validation Result", divider="grey")
-                            # Load the CSV data into a DataFrame
-                            ipqs_validation_df = pd.read_csv(download_link)
-
-                            # Save the styled DataFrame to a temporary Excel file
-                            temp_file_path = os.path.join(os.getcwd(), "temp.xlsx")
-                            ipqs_validation_df.to_excel(temp_file_path, index=False, engine='openpyxl')
-                            # Read the temporary file as bytes
-                            with open(temp_file_path, "rb") as file:
-                                excel_data = file.read()
-                            # Remove the temporary file
-                            os.remove(temp_file_path)
+
+                            # Evaluate the account's validity rules as vectorized masks
+                            metrics.timed("rules", finalize_results, ipqs_validation_df, account_name,
+                                          rows=len(ipqs_validation_df.index))
+
+                            # Display specific columns along with the new "Validation Status" column
+                            columns_to_display = ["Date", "Email Address", "Recent Abuse", "Valid", "Disposable", "Honeypot", "Spam Trap Score", VERDICT_COLUMN, REASON_COLUMN]
+                            st.dataframe(ipqs_validation_df[columns_to_display])
 
                             # Get today's date
                             today_date = datetime.today().strftime("[%Y%m%d_Cleansed]")
 
-                            filename = f"[IPQS] {today_date}_{filename}.xlsx"
+                            # Create a download button using Streamlit
+                            export_buttons(ipqs_validation_df, f"[IPQS] {today_date}_{filename}", "📄 Download IPQS Result", key="ipqs_result_export")
 
-                            # Check conditions and create a new column
-                            ipqs_validation_df["IPQS Validation"] = ipqs_validation_df.apply(
-                                lambda row: "Valid" if (row["Recent Abuse"] == False and
-                                                        row["Valid"] == True and
-                                                        row["Disposable"] == False and
-                                                        row["Honeypot"] == False and
-                                                        row["Spam Trap Score"] == "none") else "Invalid",
-                                axis=1
-                            )
+                            st.markdown("###")
+                            st.subheader("Source File", divider="grey")
+                            result_columns = [col for col in ipqs_validation_df.columns if col != "Email Address"]
+                            carried_columns = st.multiselect("IPQS columns to add:", result_columns, default=[VERDICT_COLUMN], key="carried_columns")
 
-                            # Display specific columns along with the new "Validation Status" column
-                            columns_to_display = ["Date", "Email Address", "Recent Abuse", "Valid", "Disposable", "Honeypot", "Spam Trap Score", "IPQS Validation"]
-                            st.dataframe(ipqs_validation_df[columns_to_display])
+                            with metrics.stage("join") as record:
+                                # Shallow copy: the new columns never touch the stored upload
+                                df = source_rows.copy(deep=False)
+                                record["rows"] = len(df.index)
+
+                                # Match on the trimmed, lowercased email in one vectorized join
+                                unmatched = join_results(df, email_column, ipqs_validation_df, carried_columns)
+                            st.caption("The selected IPQS columns have been added to the dataframe below.")
+                            if unmatched:
+                                st.warning(f"{unmatched} rows with an email address did not match an IPQS result.")
+                            st.dataframe(df)
 
                             # Create a download button using Streamlit
-                            st.download_button(label="📄 Download IPQS Result", data=excel_data, file_name=filename, mime="application/octet-stream")
+                            export_buttons(df, output_name(filename), "📄 Download List with IPQS", key="source_export")
 
-                            return ipqs_validation_df
+                else:
+                    state.ipqs_button_clicked = False
 
-                    if st.button("Yes, I want to proceed", disabled=state.ipqs_disabled, key='ipqs_run_button', on_click=ipqs_disable):
-                        state.ipqs_button_clicked = True
-                        st.write("IPQS running in progress...")  # Display a message indicating that the process is running
-                        status = st.progress(0)
-                        for t in range(10):
-                            time.sleep(.2)
-                            status.progress(10 * t + 10)
-                        st.rerun()
+    if batch_files and account_name != "":
+        # The same email column detection as a single upload, once per file
+        started = time.perf_counter()
+        # Room for every file of the batch, so reruns do not push each other out, up to a cap
+        uploads.max_entries = min(max(UPLOAD_CACHE_ENTRIES, len(batch_files)), UPLOAD_CACHE_MAX_ENTRIES)
+        files, skipped = load_batch(batch_files, upload_cache=uploads)
+        # Named after the files' contents, so files that only share names are a different batch
+        batch_list = batch_name(account_name, files)
+
+        # Start a fresh set of stage timings for each new batch
+        if metrics.context.get("file_name") != batch_list:
+            metrics = state.metrics = RunMetrics(account=account_name, file_name=batch_list)
+        batch_rows_total = sum(len(batch_file.emails.index) for batch_file in files)
+        metrics.record("load_file", time.perf_counter() - started, rows=batch_rows_total)
+
+        st.write(batch_list)
+        if skipped:
+            st.warning(f"No email column found in {', '.join(skipped)}. These files are left out of the batch.")
+
+        if files:
+            overlap = metrics.timed("dedupe", find_overlap, files, rows=batch_rows_total)
+            batch_unique = batch_emails(files)
+            shared_per_file = overlap.per_file()
 
-                    if state.ipqs_button_clicked:
-                        ipqs_validation_df = ipqs_validation()      
-
-                        # Create a dictionary for faster lookup of validation info
-                        validation_dict = dict(zip(ipqs_validation_df["Email Address"], ipqs_validation_df["IPQS Validation"]))
-
-                        # Iterate through df and update the "IPQS Validation" column based on the dictionary
-                        for index, row in df.iterrows():
-                            email = row[email_column]
-                            if email in validation_dict:
-                                df.at[index, 'IPQS Validation'] = validation_dict[email]   
-
-                        st.markdown("###")
-                        st.subheader("Source File", divider="grey")
-                        st.caption("IPQS Validation column has been added to the dataframe below.")
-                        st.dataframe(df)
-
-                        # Save the styled DataFrame to a temporary Excel file
-                        temp_file_path = os.path.join(os.getcwd(), "temp.xlsx")
-                        df.to_excel(temp_file_path, index=False, engine='openpyxl')
-                        # Read the temporary file as bytes
-                        with open(temp_file_path, "rb") as file:
-                            excel_data = file.read()
-                        # Remove the temporary file
-                        os.remove(temp_file_path)
-
-                        # Get today's date
-                        today_date = datetime.today().strftime("[%Y%m%d_IPQS]")
-
-                        filename = f"{today_date} {filename}.xlsx"
-
-                        # Create a download button using Streamlit
-                        st.download_button(label="📄 Download List with IPQS", data=excel_data, file_name=filename, mime="application/octet-stream")  
-                        
+            st.markdown('###')
+            st.subheader("Batch Files", divider='grey')
+            st.dataframe(pd.DataFrame({
+                "File": [batch_file.name for batch_file in files],
+                "Email Column": [batch_file.email_column for batch_file in files],
+                "Contacts": [int(batch_file.emails.notna().sum()) for batch_file in files],
+                "Shared With Other Files": [int(shared_per_file.get(batch_file.name, 0)) for batch_file in files],
+            }), hide_index=True)
+            st.write("Unique emails across all files: ", len(batch_unique))
+
+            if overlap.count:
+                with st.container(border=True):
+                    st.markdown("##### Cross-File Duplication")
+                    st.warning(f"{overlap.count} email addresses appear in more than one file. Each is checked once.")
+                    st.dataframe(overlap.table(), hide_index=True)
+
+            st.info("📥 Each unique email address will consume one credit under the 2X IPQS account. " + prefilter_note(account_name))
+
+            job_id = state.job_ids.get(batch_list)
+            if st.button("Validate batch", disabled=job_id is not None, key="batch_run_button"):
+                # Attach to a batch job already running for the same files
+                active_job = job_manager.find_active(account_name, batch_key(files))
+                job_id = active_job["job_id"] if active_job else job_manager.submit(account_name, batch_list, batch_unique,
+                                                                                   content_key=batch_key(files))
+                state.job_ids[batch_list] = job_id
+                st.rerun()
+
+            @st.fragment(run_every=2)
+            def batch_progress(job_id):
+                job = job_manager.job(job_id)
+                if job["status"] in ACTIVE_STATUSES:
+                    st.progress(job["progress"], text=job["message"] or "Operation in progress. Please wait.")
                 else:
-                    state.ipqs_button_clicked = False
+                    st.rerun()
+
+            if job_id:
+                job = job_manager.job(job_id)
+                if job["status"] in ACTIVE_STATUSES:
+                    batch_progress(job_id)
+                else:
+                    if job["local_rejects"]:
+                        st.info(f"Local pre-filter: {job['local_rejects']} emails rejected without being uploaded.")
+                    if job["status"] == "FAILED":
+                        st.error(job["message"])
+
+                    batch_results = frames.get(f"job:{job_id}")
+                    if batch_results is None:
+                        job_result = job_manager.result(job_id)
+                        if job_result is not None:
+                            batch_results = frames.put(f"job:{job_id}", job_result, path=job_manager.store.result_path(job_id))
+                        elif job["status"] == "FINISHED":
+                            st.warning("This batch's result is no longer stored. Validate the batch again to rebuild it.")
+                            state.job_ids.pop(batch_list, None)
+
+                    if batch_results is not None and not batch_results.empty:
+                        st.success("Batch processing is finished.")
+                        batch_results = batch_results.copy(deep=False)
+                        metrics.timed("rules", finalize_results, batch_results, account_name, rows=len(batch_results.index))
+
+                        st.subheader("Batch Outputs", divider="grey")
+                        result_columns = [col for col in batch_results.columns if col != "Email Address"]
+                        carried_columns = st.multiselect("IPQS columns to add:", result_columns, default=[VERDICT_COLUMN], key="batch_carried_columns")
+
+                        # Each file's full rows are read once and kept with the session's other frames
+                        def batch_rows(batch_file):
+                            rows_name = f"batch:{batch_list}:{batch_file.name}"
+                            rows = frames.get(rows_name)
+                            if rows is None:
+                                rows = frames.put(rows_name, batch_file.ingest.read_rows())
+                                batch_file.ingest.close()
+                            return rows
+
+                        with metrics.stage("join") as record:
+                            outputs = split_results(files, batch_results, carried_columns, read_rows=batch_rows)
+                            record["rows"] = sum(len(output.index) for output, _ in outputs.values())
+
+                        base_names = output_names(account_name, list(outputs))
+                        largest = max((output for output, _ in outputs.values()), key=lambda output: len(output.index))
+                        export_format = st.radio("Download format", export_formats(largest), horizontal=True, key="batch_export_format")
+                        st.download_button(label="🗂️ Download all as zip",
+                                           data=partial(metrics.timed, "export", export_zip,
+                                                        {base_names[name]: output for name, (output, _) in outputs.items()},
+                                                        export_format, rows=record["rows"]),
+                                           file_name=f"{output_name(batch_list)}.zip", mime="application/zip", key="batch_zip_download")
+
+                        for name, (output, unmatched) in outputs.items():
+                            with st.expander(f"{name} ({len(output.index):,} rows)"):
+                                if unmatched:
+                                    st.warning(f"{unmatched} rows with an email address did not match an IPQS result.")
+                                st.dataframe(output.head(PAGE_SIZES[1]))
+                                st.download_button(label=f"📄 Download {name} with IPQS",
+                                                   data=partial(metrics.timed, "export", export_bytes, output, export_format, rows=len(output.index)),
+                                                   file_name=export_file_name(base_names[name], export_format),
+                                                   mime=EXPORT_MIME_TYPES[export_format], key=f"batch_download_{name}")
+
+    # Where the time went for this file: page stages, the validation job and audit logging
+    with st.expander("Diagnostics"):
+        st.caption("Page stages")
+        st.dataframe(pd.DataFrame(metrics.summary()), hide_index=True)
+        job_id = st.session_state.job_ids.get(metrics.context.get("file_name"))
+        job = job_manager.job(job_id) if job_id else None
+        if job and job["metrics"]:
+            st.caption("Validation job stages (seconds are summed across parallel CSV parts)")
+            st.dataframe(pd.DataFrame(job["metrics"]), hide_index=True)
+        st.caption("Audit logging")
+        st.json(audit_logger.stats)
+        st.caption(f"Upload cache: {uploads.hits:,} hits, {uploads.misses:,} parses, "
+                   f"{uploads.memory_bytes() / 1024 / 1024:,.1f} MB of {uploads.max_bytes / 1024 / 1024:,.0f} MB")
+        st.caption(f"Session memory: {frames.memory_bytes() / 1024 / 1024:,.1f} MB of {frames.budget / 1024 / 1024:,.0f} MB")
+        st.dataframe(pd.DataFrame(frames.summary() + uploads.summary()), hide_index=True)
 
 # Check if user is logged in
 if 'account_name' not in st.session_state:
@@ -0,0 +1,62 @@
+"""Shared fixtures: a local IPQS stand-in and job managers on temporary stores."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.mock_ipqs import MockIPQS
+from ipqs import client
+from ipqs.cache import VerdictCache
+from ipqs.client import Validate
+from ipqs.jobs import JobManager, JobStore
+from ipqs.results import ResultStore
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "slow: timing tests on large synthetic lists (run with -m slow)")
+
+
+def pytest_collection_modifyitems(config, items):
+    # Slow tests only run when selected with -m
+    if config.getoption("-m"):
+        return
+    skip = pytest.mark.skip(reason="slow; run with -m slow")
+    for item in items:
+        if "slow" in item.keywords:
+            item.add_marker(skip)
+
+
+@pytest.fixture
+def mock_ipqs():
+    mock = MockIPQS(queue_delay=0.05, seconds_per_1k=0.01, finalize_delay=0.05).start()
+    yield mock
+    mock.stop()
+
+
+@pytest.fixture
+def fast_polling(monkeypatch):
+    monkeypatch.setattr(client, "POLL_INTERVALS", dict.fromkeys(client.POLL_INTERVALS, 0.01))
+    monkeypatch.setattr(client, "POLL_MAX_INTERVAL", 0.01)
+    monkeypatch.setattr(client, "BACKOFF_BASE", 0.001)
+
+
+@pytest.fixture
+def make_manager(mock_ipqs, fast_polling, tmp_path):
+    """Build JobManagers; managers with the same workdir share their stores."""
+    managers = []
+
+    def make(workdir="stores", **kwargs):
+        kwargs.setdefault("store", JobStore(str(tmp_path / workdir / "jobs")))
+        kwargs.setdefault("verdict_cache", VerdictCache(str(tmp_path / workdir / "cache.sqlite3")))
+        kwargs.setdefault("result_store", ResultStore(str(tmp_path / workdir / "results")))
+        kwargs.setdefault("resume", False)
+        kwargs.setdefault("prefilter", False)
+        manager = JobManager(Validate("test", base_url=mock_ipqs.base_url), **kwargs)
+        managers.append(manager)
+        return manager
+
+    yield make
+    for manager in managers:
+        manager._executor.shutdown(wait=True)
@@ -0,0 +1,77 @@
+import json
+
+import pytest
+
+from ipqs import audit
+from ipqs.audit import AuditLogger, AuditSink, FileSink, MemorySink
+
+
+class FlakySink(AuditSink):
+    """Fails while down is set, then keeps rows like a MemorySink."""
+
+    def __init__(self) -> None:
+        self.down = True
+        self.rows = []
+
+    def write(self, rows: list) -> None:
+        if self.down:
+            raise ConnectionError("Sheets is down")
+        self.rows.extend(rows)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(audit, "RETRY_INTERVAL", 0.0)
+
+
+def logger(sink, tmp_path):
+    return AuditLogger(sink, spool_path=str(tmp_path / "spool.jsonl"), flush_interval=0.01)
+
+
+def test_rows_reach_the_sink_in_order(tmp_path):
+    sink = MemorySink()
+    audit_logger = logger(sink, tmp_path)
+    for n in range(5):
+        audit_logger.log([n, "row"])
+    assert audit_logger.flush(timeout=5)
+    assert sink.rows == [[n, "row"] for n in range(5)]
+    assert not (tmp_path / "spool.jsonl").exists()
+
+
+def test_failed_batches_are_spooled_and_replayed_first(tmp_path):
+    sink = FlakySink()
+    audit_logger = logger(sink, tmp_path)
+    audit_logger.log(["first"])
+    assert audit_logger.flush(timeout=5)
+    assert sink.rows == []
+    assert (tmp_path / "spool.jsonl").read_text() == '["first"]\n'
+
+    sink.down = False
+    audit_logger.log(["second"])
+    assert audit_logger.flush(timeout=5)
+    assert sink.rows == [["first"], ["second"]]
+    assert not (tmp_path / "spool.jsonl").exists()
+    assert audit_logger.stats["failures"] == 1
+
+
+def test_truncated_spool_line_is_set_aside(tmp_path):
+    spool = tmp_path / "spool.jsonl"
+    spool.write_text('["spooled"]\n["cut sho')
+    sink = MemorySink()
+    audit_logger = logger(sink, tmp_path)
+    audit_logger.log(["new"])
+    assert audit_logger.flush(timeout=5)
+
+    assert sink.rows == [["spooled"], ["new"]]
+    assert not spool.exists()
+    assert (tmp_path / "spool.jsonl.damaged").read_text() == '["cut sho\n'
+    assert audit_logger.stats["damaged_lines"] == 1
+
+
+def test_file_sink_starts_a_new_line_after_a_truncated_one(tmp_path):
+    path = tmp_path / "audit.jsonl"
+    path.write_text('["cut sho')
+    FileSink(str(path)).write([["a", 1], ["b", 2]])
+    lines = path.read_text().splitlines()
+    assert lines[0] == '["cut sho'
+    assert [json.loads(line) for line in lines[1:]] == [["a", 1], ["b", 2]]
@@ -0,0 +1,29 @@
+import pandas as pd
+
+from ipqs.batch import batch_key, batch_name, load_batch
+
+
+def write_list(path, emails):
+    pd.DataFrame({"Email": emails}).to_csv(path, index=False)
+    return str(path)
+
+
+def test_batches_of_same_named_files_with_other_rows_are_separate(tmp_path):
+    for folder, domain in (("first", "a.com"), ("second", "b.com"), ("copy", "a.com")):
+        (tmp_path / folder).mkdir()
+        write_list(tmp_path / folder / "leads.csv", [f"person{n}@{domain}" for n in range(5)])
+        write_list(tmp_path / folder / "events.csv", ["shared@example.com"])
+
+    names = {}
+    for folder in ("first", "second", "copy"):
+        files, _ = load_batch([str(tmp_path / folder / "leads.csv"), str(tmp_path / folder / "events.csv")])
+        names[folder] = batch_name("ACME", files)
+    assert names["first"] != names["second"]
+    assert names["first"] == names["copy"]
+
+
+def test_batch_key_ignores_file_order(tmp_path):
+    paths = [write_list(tmp_path / "a.csv", ["a@example.com"]), write_list(tmp_path / "b.csv", ["b@example.com"])]
+    forward, _ = load_batch(paths)
+    backward, _ = load_batch(paths[::-1])
+    assert batch_key(forward) == batch_key(backward)
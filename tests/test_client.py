@@ -0,0 +1,111 @@
+import threading
+
+import pytest
+import requests
+
+from ipqs import client
+from ipqs.client import Validate
+
+
+@pytest.fixture
+def validate(mock_ipqs):
+    return Validate("test", base_url=mock_ipqs.base_url)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Record the client's sleeps on the test thread instead of waiting."""
+    recorded = []
+    thread = threading.current_thread()
+    real_sleep = client.time.sleep
+
+    def sleep(seconds):
+        if threading.current_thread() is thread:
+            recorded.append(seconds)
+        else:
+            real_sleep(seconds)
+
+    monkeypatch.setattr(client.time, "sleep", sleep)
+    return recorded
+
+
+def upload(validate, emails=("a@example.com",)):
+    return validate.upload_csv("list.csv", [[email] for email in emails])["id"]
+
+
+def test_retries_throttling_and_server_errors_with_backoff(validate, mock_ipqs, sleeps):
+    csv_id = upload(validate)
+    mock_ipqs.fail_next("status", 503, times=2)
+    mock_ipqs.fail_next("status", 429)
+    assert validate.check_status(csv_id)["success"]
+    assert mock_ipqs.request_counts()["status"] == 4
+    # Full jitter: each delay is at most the exponential cap for its attempt
+    assert len(sleeps) == 3
+    for attempt, delay in enumerate(sleeps):
+        assert 0 <= delay <= min(client.BACKOFF_CAP, client.BACKOFF_BASE * 2 ** attempt)
+
+
+def test_gives_up_after_max_retries(validate, mock_ipqs, sleeps):
+    csv_id = upload(validate)
+    mock_ipqs.fail_next("status", 502, times=client.MAX_RETRIES + 1)
+    with pytest.raises(requests.HTTPError):
+        validate.check_status(csv_id)
+    assert mock_ipqs.request_counts()["status"] == client.MAX_RETRIES + 1
+    assert len(sleeps) == client.MAX_RETRIES
+
+
+@pytest.mark.parametrize("retry_after, delay", [("7", 7.0), ("600", client.BACKOFF_CAP)])
+def test_honours_retry_after(validate, mock_ipqs, sleeps, retry_after, delay):
+    mock_ipqs.fail_next("list", 429, retry_after=retry_after)
+    assert validate.get_list()["success"]
+    assert sleeps == [delay]
+
+
+def test_upload_is_not_retried_on_server_errors(validate, mock_ipqs, sleeps):
+    mock_ipqs.fail_next("upload", 500)
+    with pytest.raises(requests.HTTPError):
+        upload(validate)
+    assert mock_ipqs.request_counts()["upload"] == 1
+    assert sleeps == []
+
+
+def test_upload_is_retried_when_throttled(validate, mock_ipqs, sleeps):
+    mock_ipqs.fail_next("upload", 429)
+    assert upload(validate)
+    assert mock_ipqs.request_counts()["upload"] == 2
+    assert len(mock_ipqs.jobs) == 1
+
+
+def test_poll_interval_follows_the_status(validate, mock_ipqs, sleeps):
+    csv_id = upload(validate)
+    mock_ipqs.script_statuses(csv_id, ["NEW", "NEW", "NEW", "PROCESSING", "UNIQUE_RESULTS", "FINALIZING", "FINISHED"])
+    statuses = [response["status"] for response in validate.poll_status(csv_id)]
+    assert statuses[-1] == "FINISHED"
+    new = client.POLL_INTERVALS["NEW"]
+    # The interval grows while a status repeats and resets when it changes
+    assert sleeps == [new, new * client.POLL_GROWTH, new * client.POLL_GROWTH ** 2,
+                      client.POLL_INTERVALS["PROCESSING"], client.POLL_INTERVALS["UNIQUE_RESULTS"],
+                      client.POLL_INTERVALS["FINALIZING"]]
+
+
+def test_poll_interval_is_capped(validate, mock_ipqs, sleeps, monkeypatch):
+    monkeypatch.setattr(client, "POLL_MAX_INTERVAL", 4.0)
+    csv_id = upload(validate)
+    mock_ipqs.script_statuses(csv_id, ["PROCESSING"] * 5 + ["FINISHED"])
+    list(validate.poll_status(csv_id))
+    assert max(sleeps) == 4.0
+
+
+def test_poll_stops_on_error(validate, mock_ipqs, sleeps):
+    csv_id = upload(validate)
+    mock_ipqs.script_statuses(csv_id, ["NEW", "ERROR"])
+    assert [response["status"] for response in validate.poll_status(csv_id)] == ["NEW", "ERROR"]
+
+
+def test_poll_raises_after_the_deadline(validate, mock_ipqs, fast_polling):
+    csv_id = upload(validate)
+    mock_ipqs.script_statuses(csv_id, ["PROCESSING"])
+    with pytest.raises(TimeoutError):
+        for _ in validate.poll_status(csv_id, deadline=0.2):
+            pass
+    assert mock_ipqs.request_counts()["status"] > 1
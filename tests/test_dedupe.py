@@ -0,0 +1,70 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ipqs.dedupe import find_duplicates
+from ipqs.neardupe import MATCH_EXACT, MATCH_MAILBOX, MATCH_SIMILAR, MATCH_TYPO
+
+# Seconds allowed per row with near-duplicate detection on; catches anything worse than linear
+SECONDS_PER_ROW = 30e-6
+
+
+def contact_emails(rows: int, seed: int = 0) -> pd.Series:
+    """Name-shaped addresses, the case that puts the most pairs in each near-duplicate block."""
+    rng = np.random.default_rng(seed)
+    letters = np.array(list("abcdefghijklmnopqrstuvwxyz"))
+
+    def names(count, shortest, longest):
+        return ["".join(rng.choice(letters, rng.integers(shortest, longest))) for _ in range(count)]
+
+    first = np.array(names(300, 3, 9))
+    last = np.array(names(2000, 4, 11))
+    domains = np.array(["gmail.com", "yahoo.com", "outlook.com", "hotmail.com", "acme.com", "globex.com"])
+    separators = np.array([".", "_", ""])
+    local = (pd.Series(first[rng.integers(0, len(first), rows)])
+             + separators[rng.integers(0, len(separators), rows)]
+             + last[rng.integers(0, len(last), rows)])
+    numbered = rng.random(rows) < 0.3
+    local[numbered] += rng.integers(1, 99, int(numbered.sum())).astype(str)
+    return local + "@" + domains[rng.integers(0, len(domains), rows)]
+
+
+def test_match_kinds():
+    emails = pd.Series(["john.smith@example.com", "john.smith@example.com ", "", None,
+                        "j.o.h.n.doe@gmail.com", "johndoe+news@gmail.com",
+                        "aliceb@gmial.com", "aliceb@gmail.com",
+                        "christopher@example.com", "christophe@example.com",
+                        "maria1@example.com", "maria2@example.com"], index=range(1, 13))
+    report = find_duplicates(emails)
+    assert report.match.dropna().to_dict() == {
+        1: MATCH_EXACT, 2: MATCH_EXACT, 5: MATCH_MAILBOX, 6: MATCH_MAILBOX,
+        7: MATCH_TYPO, 8: MATCH_TYPO, 9: MATCH_SIMILAR, 10: MATCH_SIMILAR,
+    }
+    assert report.first_seen[[2, 6, 8, 10]].tolist() == [1, 5, 7, 9]
+    # Blank rows are never duplicates
+    assert not report.mask[[3, 4]].any()
+
+
+def test_exact_only_when_near_duplicates_are_off():
+    emails = pd.Series(["a.b@gmail.com", "ab@gmail.com", "x@example.com", "X@example.com"])
+    assert find_duplicates(emails, near=False).mask.tolist() == [True, True, True, True]
+    assert find_duplicates(pd.Series(["christopher@example.com", "christophe@example.com"]), near=False).count == 0
+
+
+def test_blank_and_empty_lists():
+    assert find_duplicates(pd.Series([], dtype=object)).count == 0
+    assert find_duplicates(pd.Series(["", None, " "])).count == 0
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("rows", [10_000, 100_000, 1_000_000])
+def test_find_duplicates_timing(rows):
+    emails = contact_emails(rows)
+    started = time.perf_counter()
+    report = find_duplicates(emails)
+    elapsed = time.perf_counter() - started
+    print(f"\nfind_duplicates: {rows:,} rows in {elapsed:.2f}s, {report.count:,} duplicates {report.match_counts()}")
+    assert report.count > 0
+    assert elapsed <= max(1.0, rows * SECONDS_PER_ROW)
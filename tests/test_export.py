@@ -0,0 +1,26 @@
+import io
+import warnings
+
+import pandas as pd
+
+from ipqs.export import export_bytes
+
+
+def test_parquet_keeps_column_types_and_stores_mixed_columns_as_text():
+    df = pd.DataFrame({
+        "Email Address": ["a@example.com", "b@example.com"],
+        "Valid": pd.array([True, None], dtype="boolean"),
+        "Fraud Score": pd.array([10, None], dtype="Int64"),
+        "Disposable": [False, True],
+        "Phone": pd.Series([5551234, "N/A"], dtype=object),
+    })
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        data = export_bytes(df, 'parquet')
+    stored = pd.read_parquet(io.BytesIO(data))
+
+    assert stored["Valid"].dtype == "boolean"
+    assert stored["Fraud Score"].dtype == "Int64"
+    assert stored["Disposable"].dtype == bool
+    assert stored["Phone"].tolist() == ["5551234", "N/A"]
+    assert stored["Email Address"].tolist() == ["a@example.com", "b@example.com"]
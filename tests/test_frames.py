@@ -0,0 +1,31 @@
+import os
+
+import pandas as pd
+
+from ipqs.frames import SessionFrames
+
+
+def test_spilled_source_rows_come_back_unchanged(tmp_path):
+    frames = SessionFrames(budget_mb=0, spill_dir=str(tmp_path))
+    rows = pd.DataFrame({"Email": ["a@example.com", "b@example.com", "c@example.com"],
+                         "Phone": [5551234, "N/A", 5559876]}, index=[1, 3, 4])
+    stored = frames.put("source_rows", rows)
+
+    # Storing a second frame drops the first one from memory
+    frames.put("other", pd.DataFrame({"Email": ["d@example.com"]}))
+    assert frames.summary()[0]["in_memory"] is False
+
+    reloaded = frames.get("source_rows")
+    assert reloaded.index.tolist() == [1, 3, 4]
+    assert reloaded["Phone"].tolist() == [5551234, "N/A", 5559876]
+    pd.testing.assert_frame_equal(reloaded, stored)
+
+
+def test_discarded_spills_are_deleted(tmp_path):
+    frames = SessionFrames(budget_mb=0, spill_dir=str(tmp_path))
+    frames.put("first", pd.DataFrame({"Email": ["a@example.com"]}))
+    frames.put("second", pd.DataFrame({"Email": ["b@example.com"]}))
+    path = frames._entries["first"].path
+    assert os.path.exists(path)
+    frames.discard("first")
+    assert not os.path.exists(path)
@@ -0,0 +1,71 @@
+import pandas as pd
+import pytest
+
+from ipqs import ingest as ingest_module
+from ipqs.ingest import Ingest
+
+
+@pytest.fixture(params=["pyarrow", "c"])
+def csv_engine(request, monkeypatch):
+    if request.param == "pyarrow":
+        pytest.importorskip("pyarrow")
+    monkeypatch.setattr(ingest_module, "CSV_ENGINE", request.param)
+    return request.param
+
+
+def test_csv_with_byte_order_mark(tmp_path, csv_engine):
+    path = tmp_path / "list.csv"
+    path.write_bytes(b"\xef\xbb\xbfEmail,Name\r\na@example.com,A\r\nb@example.com,B\r\n")
+    ingest = Ingest(str(path))
+    assert ingest.email_column == "Email"
+    assert ingest.columns == ["Email", "Name"]
+    assert ingest.read_emails().tolist() == ["a@example.com", "b@example.com"]
+    assert ingest.read_rows().columns.tolist() == ["Email", "Name"]
+
+
+def test_csv_header_below_title_rows(tmp_path, csv_engine):
+    path = tmp_path / "list.csv"
+    path.write_text("Exported contacts\n\nName,Work Email\nA,a@example.com\n")
+    ingest = Ingest(str(path))
+    assert (ingest.header_row, ingest.email_column) == (2, "Work Email")
+    emails = ingest.read_emails()
+    assert emails.tolist() == ["a@example.com"]
+    pd.testing.assert_index_equal(emails.index, ingest.read_rows().index, check_exact=False)
+
+
+def padded_workbook(path, header, rows):
+    from openpyxl import Workbook
+    from openpyxl.styles import PatternFill
+
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(header)
+    for row in rows:
+        sheet.append(row)
+    # Formatted but empty cells to the right of and below the data
+    fill = PatternFill("solid", fgColor="FFFF00")
+    for row in range(1, len(rows) + 10):
+        for column in range(1, len(header) + 5):
+            sheet.cell(row=row, column=column).fill = fill
+    workbook.save(path)
+
+
+def test_xlsx_ignores_formatted_empty_cells(tmp_path):
+    path = str(tmp_path / "list.xlsx")
+    padded_workbook(path, ["Name", "Email"], [["A", "a@example.com"], ["B", "b@example.com"], ["C", None]])
+    ingest = Ingest(path)
+    assert ingest.columns == ["Name", "Email"]
+    assert ingest.read_emails().tolist() == ["a@example.com", "b@example.com"]
+    df = ingest.read_rows()
+    assert df.columns.tolist() == ["Name", "Email"]
+    assert len(df.index) == 3
+    pd.testing.assert_frame_equal(df.reset_index(drop=True), pd.read_excel(path), check_dtype=False)
+    ingest.close()
+
+
+def test_xlsx_values_past_the_header_get_unnamed_columns(tmp_path):
+    path = str(tmp_path / "list.xlsx")
+    padded_workbook(path, ["Name", "Email"], [["A", "a@example.com", "note"]])
+    ingest = Ingest(path)
+    assert ingest.read_rows().columns.tolist() == pd.read_excel(path).columns.tolist()
+    ingest.close()
@@ -0,0 +1,170 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from contextlib import closing
+
+import pandas as pd
+import pytest
+
+from ipqs.jobs import JobStore, process_owner
+from ipqs.pipeline import finalize_results
+
+
+def emails(count):
+    return [f"person{n}@example.com" for n in range(count)]
+
+
+def test_job_finishes_with_every_row(make_manager):
+    manager = make_manager(realtime_threshold=0, shard_size=100)
+    job_id = manager.submit("ACME", "ACME_list", emails(300))
+    job = manager.wait(job_id, interval=0.05)
+    assert job["status"] == "FINISHED"
+    assert [shard["status"] for shard in job["shards"]] == ["FINISHED"] * 3
+    assert len(manager.result(job_id).index) == 300
+
+
+@pytest.mark.parametrize("cached", [False, True])
+def test_resume_downloads_finished_shard_missing_from_result_store(make_manager, mock_ipqs, cached):
+    manager = make_manager(realtime_threshold=0, shard_size=100)
+    job_id = manager.submit("ACME", "ACME_list", emails(300))
+    manager.wait(job_id, interval=0.05)
+
+    # Back to the state of a job interrupted while RUNNING: FINISHED was saved but the download is gone,
+    # with or without its rows in the verdict cache
+    store = manager.store
+    shards = store.load_shards(job_id)
+    for shard in shards:
+        shard.emails = emails(300)[shard.index * 100:(shard.index + 1) * 100]
+    store.save_shards(job_id, shards)
+    store.update_job(job_id, emails=json.dumps(emails(300)))
+    shard = shards[1]
+    os.remove(manager.result_store.path(shard.csv_id))
+    if not cached:
+        with manager.verdict_cache._connect() as conn:
+            conn.executemany("DELETE FROM verdicts WHERE email = ?", [(email,) for email in shard.emails])
+    store.update_job(job_id, status="RUNNING")
+    downloads = mock_ipqs.request_counts()["download"]
+
+    resumed = make_manager(store=JobStore(store.directory), resume=True, realtime_threshold=0, shard_size=100)
+    job = resumed.wait(job_id, interval=0.05)
+    assert job["status"] == "FINISHED"
+    assert mock_ipqs.request_counts()["download"] == downloads + 1
+    assert mock_ipqs.request_counts()["upload"] == 3
+    result = resumed.result(job_id)
+    assert len(result.index) == 300
+    assert result["Email Address"].tolist() == emails(300)
+
+
+def test_finished_jobs_drop_their_email_lists(make_manager):
+    manager = make_manager(realtime_threshold=0, shard_size=100)
+    job_id = manager.submit("ACME", "ACME_list", emails(150))
+    manager.wait(job_id, interval=0.05)
+    manager._executor.shutdown(wait=True)
+    assert manager.store.job_emails(job_id) == []
+    assert [shard.emails for shard in manager.store.load_shards(job_id)] == [[], []]
+    assert manager.job(job_id)["total_emails"] == 150
+    assert "emails" not in manager.job(job_id)
+
+
+def test_result_files_are_evicted_least_recently_used_first(make_manager):
+    manager = make_manager(realtime_threshold=100)
+    store = manager.store
+    job_ids = []
+    for name in ("first", "second", "third"):
+        job_id = manager.submit("ACME", name, emails(20))
+        manager.wait(job_id, interval=0.05)
+        job_ids.append(job_id)
+    manager._executor.shutdown(wait=True)
+    paths = [store.result_path(job_id) for job_id in job_ids]
+    now = time.time()
+    for age, path in zip((30, 20, 10), paths):
+        os.utime(path, (now - age, now - age))
+
+    # Reading the oldest result makes the second one the least recently used
+    assert manager.result(job_ids[0]) is not None
+    store.max_result_bytes = sum(os.path.getsize(path) for path in paths) - 1
+    assert store.prune() == 1
+    assert [os.path.exists(path) for path in paths] == [True, False, True]
+    assert manager.result(job_ids[1]) is None
+    assert manager.job(job_ids[1])["status"] == "FINISHED"
+
+
+def queued_job(store, owner):
+    job_id = store.create_job("ACME", "ACME_list", emails(10))
+    store.update_job(job_id, owner=owner)
+    return job_id
+
+
+def test_resume_skips_jobs_of_a_live_process(make_manager, mock_ipqs):
+    store = make_manager().store
+    job_id = queued_job(store, f"{socket.gethostname()}:{os.getppid()}")
+    make_manager(store=store, resume=True)
+    time.sleep(0.3)
+    assert store.job(job_id)["status"] == "QUEUED"
+    assert mock_ipqs.request_counts() == {}
+
+
+def test_resume_claims_jobs_of_a_stopped_process(make_manager):
+    stopped = subprocess.Popen([sys.executable, "-c", "pass"])
+    stopped.wait()
+    store = make_manager().store
+    job_id = queued_job(store, f"{socket.gethostname()}:{stopped.pid}")
+    manager = make_manager(store=store, resume=True)
+    assert manager.wait(job_id, interval=0.05)["status"] == "FINISHED"
+    assert store.job(job_id)["owner"] == process_owner()
+    # A second manager finds nothing left to claim
+    assert not store.claim(job_id, f"{socket.gethostname()}:{stopped.pid}")
+
+
+def test_running_jobs_are_reused_by_content_not_file_name(make_manager):
+    store = make_manager().store
+    manager = make_manager(store=store)
+    job_id = store.create_job("ACME", "ACME_leads", emails(10), content_key="digest-a")
+
+    assert manager.find_active("ACME", "digest-a")["job_id"] == job_id
+    # Another list uploaded under the same name is not attached to it
+    assert manager.find_active("ACME", "digest-b") is None
+    assert manager.find_active("OTHER", "digest-a") is None
+    # Without a content key, jobs are keyed by their emails
+    other_id = store.create_job("ACME", "ACME_leads", emails(5))
+    assert store.job(other_id)["content_key"] not in ("", "digest-a")
+
+
+def test_local_rejections_keep_result_column_types(make_manager):
+    manager = make_manager(prefilter=True, realtime_threshold=0, shard_size=100)
+    listed = [f"person{n}@acme-mail.com" for n in range(20)] + ["not-an-address", "person@example.com"]
+    job_id = manager.submit("ACME", "ACME_list", listed)
+    assert manager.wait(job_id, interval=0.05)["status"] == "FINISHED"
+    result = manager.result(job_id)
+
+    assert result["Local Check"].notna().sum() == 2
+    for column in ("Valid", "Disposable", "Recent Abuse", "Honeypot", "Catch All"):
+        assert result[column].dtype == "boolean"
+    assert result["Fraud Score"].dtype == "Int64"
+    assert result["Valid"].isna().sum() == 2
+    # The verdict rules read the nullable columns like the plain ones
+    finalize_results(result, "ACME")
+    assert (result.loc[result["Local Check"].notna(), "IPQS Validation"] == "Invalid").all()
+
+
+def test_expired_verdicts_are_purged_on_start_and_after_jobs(make_manager):
+    cache = make_manager().verdict_cache
+    cache.store(pd.DataFrame({"Email Address": ["old@acme-mail.com", "new@acme-mail.com"], "Valid": [True, True]}))
+    with closing(cache._connect()) as conn, conn:
+        conn.execute("UPDATE verdicts SET validated_at = ? WHERE email = ?",
+                     (time.time() - cache.ttl_seconds - 60, "old@acme-mail.com"))
+
+    manager = make_manager(verdict_cache=cache, realtime_threshold=10)
+    with closing(cache._connect()) as conn:
+        assert [row[0] for row in conn.execute("SELECT email FROM verdicts")] == ["new@acme-mail.com"]
+
+    with closing(cache._connect()) as conn, conn:
+        conn.execute("UPDATE verdicts SET validated_at = 0")
+    job_id = manager.submit("ACME", "ACME_list", ["fresh@acme-mail.com"])
+    manager.wait(job_id, interval=0.05)
+    manager._executor.shutdown(wait=True)
+    with closing(cache._connect()) as conn:
+        assert [row[0] for row in conn.execute("SELECT email FROM verdicts")] == ["fresh@acme-mail.com"]
@@ -0,0 +1,57 @@
+import json
+
+import pytest
+
+from ipqs.prefilter import CHECKS, DEFAULT_CHECKS, PREFILTER_COLUMN, load_blocklist, load_checks, prefilter
+
+
+EMAILS = ["jane.doe@gmail.com", "not-an-email", "someone@example.com", "x@mailinator.com",
+          "info@acme.com", "sales+eu@acme.com", "test@gmail.com", "ceo@rival.com"]
+
+
+@pytest.fixture
+def rules_path(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps({
+        "blocklists": {"*": ["rival.com"]},
+        "prefilter": {"ACME": ["Role Account", "Placeholder Address"]},
+    }))
+    return str(path)
+
+
+def reasons(result):
+    return dict(zip(result.rejected["Email Address"], result.rejected[PREFILTER_COLUMN]))
+
+
+def test_default_checks_only_reject_what_the_default_profile_fails():
+    result = prefilter(EMAILS, blocklist=["rival.com"])
+    assert reasons(result) == {
+        "not-an-email": "Syntax",
+        "someone@example.com": "Placeholder Domain",
+        "x@mailinator.com": "Disposable Domain",
+        "ceo@rival.com": "Blocklist",
+    }
+    # Role accounts and placeholder names at real domains still go to IPQS
+    assert result.accepted == ["jane.doe@gmail.com", "info@acme.com", "sales+eu@acme.com", "test@gmail.com"]
+
+
+def test_accounts_opt_in_to_role_and_placeholder_address_checks(rules_path):
+    checks = load_checks("acme", rules_path)
+    assert checks == CHECKS
+    result = prefilter(EMAILS, load_blocklist("acme", rules_path), checks=checks)
+    assert reasons(result)["info@acme.com"] == "Role Account"
+    assert reasons(result)["sales+eu@acme.com"] == "Role Account"
+    assert reasons(result)["test@gmail.com"] == "Placeholder Address"
+    assert result.accepted == ["jane.doe@gmail.com"]
+
+
+def test_other_accounts_keep_the_default_checks(rules_path, tmp_path):
+    assert load_checks("GLOBEX", rules_path) == DEFAULT_CHECKS
+    assert load_checks("ACME", str(tmp_path / "missing.json")) == DEFAULT_CHECKS
+
+
+def test_unknown_check_is_rejected(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps({"prefilter": {"*": ["Role Acount"]}}))
+    with pytest.raises(ValueError, match="Role Acount"):
+        load_checks("ACME", str(path))
@@ -0,0 +1,59 @@
+import pandas as pd
+import pytest
+
+from ipqs.pipeline import finalize_results
+from ipqs.rules import REASON_COLUMN, VERDICT_COLUMN
+
+
+def emails(count):
+    return [f"person{n}@example.com" for n in range(count)]
+
+
+def validated(manager, addresses):
+    job_id = manager.submit("ACME", "ACME_list", addresses)
+    job = manager.wait(job_id, interval=0.05)
+    assert job["status"] == "FINISHED"
+    return finalize_results(manager.result(job_id), "ACME")
+
+
+def test_realtime_and_csv_modes_give_the_same_results(make_manager, mock_ipqs):
+    realtime = validated(make_manager("realtime", realtime_threshold=100), emails(40))
+    assert mock_ipqs.request_counts().get("upload", 0) == 0
+    csv = validated(make_manager("csv", realtime_threshold=0), emails(40))
+    assert mock_ipqs.request_counts()["upload"] == 1
+
+    # Columns are used by name, so only their order may differ
+    columns = sorted(csv.columns)
+    assert sorted(realtime.columns) == columns
+    assert realtime.dtypes[columns].astype(str).tolist() == csv.dtypes[columns].astype(str).tolist()
+    compared = ["Email Address", "Valid", "Fraud Score", VERDICT_COLUMN, REASON_COLUMN]
+    pd.testing.assert_frame_equal(realtime[compared], csv[compared])
+
+
+@pytest.mark.parametrize("count, threshold, mode", [(5, 5, "email"), (6, 5, "upload"), (5, 0, "upload")])
+def test_threshold_decides_the_mode(make_manager, mock_ipqs, count, threshold, mode):
+    result = validated(make_manager(realtime_threshold=threshold), emails(count))
+    assert len(result.index) == count
+    requests = mock_ipqs.request_counts()
+    other = "upload" if mode == "email" else "email"
+    assert requests[mode] >= 1
+    assert requests.get(other, 0) == 0
+
+
+def test_cached_emails_do_not_count_towards_the_threshold(make_manager, mock_ipqs):
+    validated(make_manager(realtime_threshold=0), emails(6))
+    result = validated(make_manager(realtime_threshold=5), emails(10))
+    assert len(result.index) == 10
+    assert mock_ipqs.request_counts()["email"] == 4
+    assert mock_ipqs.request_counts()["upload"] == 1
+
+
+def test_failed_lookups_fall_back_to_a_csv_job(make_manager, mock_ipqs):
+    # A client error is not retried, so exactly two lookups fail
+    mock_ipqs.fail_next("email", 400, times=2)
+    result = validated(make_manager(realtime_threshold=100), emails(20))
+    assert result["Email Address"].tolist() == emails(20)
+    assert result[VERDICT_COLUMN].notna().all()
+    assert mock_ipqs.request_counts()["upload"] == 1
+    [job] = mock_ipqs.jobs.values()
+    assert len(job["emails"]) == 2
@@ -0,0 +1,124 @@
+import json
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ipqs.rules import DEFAULT_PROFILE, REASON_COLUMN, VERDICT_COLUMN, Rule, apply_rules, load_profile
+
+# The request's target: 1M result rows in well under a second
+SECONDS_PER_MILLION_ROWS = 1.0
+
+BOOLEAN_COLUMNS = ["Recent Abuse", "Valid", "Disposable", "Honeypot"]
+
+
+def result_rows(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({column: rng.random(rows) < 0.2 for column in BOOLEAN_COLUMNS})
+    df["Valid"] = ~df["Valid"]
+    df["Spam Trap Score"] = np.array(["none", "none", "none", "low", "medium", "high"])[rng.integers(0, 6, rows)]
+    df["Fraud Score"] = rng.integers(0, 100, rows)
+    return df
+
+
+def hardcoded_verdicts(df: pd.DataFrame) -> list:
+    # The rule the page applied row by row before the rule engine
+    return df.apply(lambda row: "Valid" if (row["Recent Abuse"] == False and
+                                            row["Valid"] == True and
+                                            row["Disposable"] == False and
+                                            row["Honeypot"] == False and
+                                            row["Spam Trap Score"] == "none") else "Invalid", axis=1).tolist()
+
+
+def test_default_profile_matches_the_hardcoded_rule():
+    df = result_rows(2000)
+    expected = hardcoded_verdicts(df)
+    assert apply_rules(df.copy())[VERDICT_COLUMN].tolist() == expected
+
+    # The same results read back as text: booleans in any case, spam trap levels capitalized
+    rng = np.random.default_rng(1)
+    text = df.copy()
+    for column in BOOLEAN_COLUMNS:
+        spellings = np.where(df[column], "True", "false")
+        text[column] = np.where(rng.random(len(df.index)) < 0.5, spellings, np.char.upper(spellings.astype(str)))
+    text["Spam Trap Score"] = df["Spam Trap Score"].str.capitalize()
+    assert apply_rules(text)[VERDICT_COLUMN].tolist() == expected
+
+
+def test_reason_lists_failed_rules_in_profile_order():
+    df = pd.DataFrame({
+        "Recent Abuse": [False, True, False],
+        "Valid": [True, False, True],
+        "Disposable": [False, False, False],
+        "Honeypot": [False, False, True],
+        "Spam Trap Score": ["none", "high", "none"],
+    })
+    apply_rules(df)
+    assert df[VERDICT_COLUMN].tolist() == ["Valid", "Invalid", "Invalid"]
+    assert df[REASON_COLUMN].tolist() == ["", "Recent Abuse; Valid; Spam Trap Score", "Honeypot"]
+
+
+def test_missing_values_fail_and_optional_rules_are_skipped():
+    df = pd.DataFrame({"Valid": pd.array([True, None], dtype="boolean")})
+    rules = [Rule("Valid", "Valid", "eq", True), Rule("Catch All", "Catch All", "eq", False, optional=True)]
+    apply_rules(df, rules)
+    assert df[VERDICT_COLUMN].tolist() == ["Valid", "Invalid"]
+    assert df[REASON_COLUMN].tolist() == ["", "Valid"]
+
+
+def write_rules(tmp_path, config: dict) -> str:
+    path = tmp_path / "ipqs_rules.json"
+    path.write_text(json.dumps(config))
+    return str(path)
+
+
+def test_profiles_extend_and_override_by_rule_name(tmp_path):
+    path = write_rules(tmp_path, {
+        "profiles": {
+            "strict": {"extends": "default", "rules": [
+                {"name": "Spam Trap Score", "column": "Spam Trap Score", "op": "in", "value": ["none", "low"]},
+                {"name": "Fraud Score", "column": "Fraud Score", "op": "le", "value": 75},
+            ]},
+            "stricter": {"extends": "strict", "rules": [
+                {"name": "Fraud Score", "column": "Fraud Score", "op": "le", "value": 50},
+            ]},
+        },
+        "accounts": {"acme": "stricter", "Globex": "strict"},
+    })
+
+    # Overrides keep the rule's place; new rules come after the inherited ones
+    stricter = load_profile("ACME", path)
+    assert [rule.name for rule in stricter] == [rule.name for rule in DEFAULT_PROFILE] + ["Fraud Score"]
+    assert stricter[4].value == ["none", "low"]
+    assert stricter[5].value == 50
+    assert load_profile("globex", path)[5].value == 75
+    assert load_profile("OTHER", path) == DEFAULT_PROFILE
+
+    df = pd.DataFrame({column: [False, False] for column in BOOLEAN_COLUMNS}).assign(
+        **{"Valid": True, "Spam Trap Score": ["low", "low"], "Fraud Score": [40, 60]})
+    apply_rules(df, stricter)
+    assert df[VERDICT_COLUMN].tolist() == ["Valid", "Invalid"]
+    assert df[REASON_COLUMN].tolist() == ["", "Fraud Score"]
+
+
+@pytest.mark.parametrize("config, message", [
+    ({"profiles": {"loop": {"extends": "loop"}}, "accounts": {"ACME": "loop"}}, "extends itself"),
+    ({"accounts": {"ACME": "missing"}}, "Unknown rule profile"),
+    ({"profiles": {"bad": {"rules": [{"name": "x", "column": "x", "op": "like", "value": 1}]}},
+      "accounts": {"ACME": "bad"}}, "Unknown rule operator"),
+])
+def test_invalid_profiles_are_rejected(tmp_path, config, message):
+    with pytest.raises(ValueError, match=message):
+        load_profile("ACME", write_rules(tmp_path, config))
+
+
+@pytest.mark.slow
+def test_apply_rules_timing():
+    rows = 1_000_000
+    df = result_rows(rows)
+    started = time.perf_counter()
+    apply_rules(df)
+    elapsed = time.perf_counter() - started
+    print(f"\napply_rules: {rows:,} rows in {elapsed:.2f}s")
+    assert elapsed <= SECONDS_PER_MILLION_ROWS * rows / 1_000_000
@@ -0,0 +1,63 @@
+import io
+
+import pandas as pd
+
+from ipqs.uploads import UploadCache
+
+
+class Upload(io.BytesIO):
+    """Stands in for Streamlit's UploadedFile: bytes with a name and size."""
+
+    def __init__(self, name, data):
+        super().__init__(data)
+        self.name = name
+        self.size = len(data)
+
+
+def csv_upload(name, rows, domain="example.com"):
+    data = pd.DataFrame({"Email": [f"person{n}@{domain}" for n in range(rows)]}).to_csv(index=False)
+    return Upload(name, data.encode())
+
+
+def xlsx_upload(name, rows):
+    buffer = io.BytesIO()
+    pd.DataFrame({"Email": [f"person{n}@example.com" for n in range(rows)]}).to_excel(buffer, index=False)
+    return Upload(name, buffer.getvalue())
+
+
+def test_same_bytes_are_parsed_once():
+    cache = UploadCache()
+    first = cache.parse(csv_upload("a.csv", 10))
+    assert cache.parse(csv_upload("copy of a.csv", 10)) is first
+    assert cache.parse(csv_upload("b.csv", 10, domain="example.org")) is not first
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_workbook_is_closed_after_parsing():
+    upload = UploadCache().parse(xlsx_upload("a.xlsx", 10))
+    assert upload.ingest._workbook is None
+    assert len(upload.emails.index) == 10
+    # Full rows still read on demand
+    assert len(upload.ingest.read_rows().index) == 10
+
+
+def test_entries_are_evicted_by_memory():
+    sizes = {}
+    for rows, domain in ((1000, "a.com"), (2000, "b.com")):
+        probe = UploadCache().parse(csv_upload("probe.csv", rows, domain))
+        probe.duplicate_report()
+        sizes[rows] = probe.memory_bytes()
+
+    cache = UploadCache(max_entries=10, max_mb=(sizes[1000] + sizes[2000] - 1) / 1024 / 1024)
+    cache.parse(csv_upload("a.csv", 1000, "a.com")).duplicate_report()
+    cache.parse(csv_upload("b.csv", 2000, "b.com")).duplicate_report()
+    cache.parse(csv_upload("c.csv", 1000, "c.com"))
+    assert [row["frame"] for row in cache.summary()] == ["upload:b.csv", "upload:c.csv"]
+    assert cache.memory_bytes() == sum(upload.memory_bytes() for upload in cache._entries.values())
+
+
+def test_newest_entry_stays_when_over_budget_alone():
+    cache = UploadCache(max_mb=0)
+    cache.parse(csv_upload("a.csv", 100, "a.com"))
+    cache.parse(csv_upload("b.csv", 100, "b.com"))
+    assert [row["frame"] for row in cache.summary()] == ["upload:b.csv"]